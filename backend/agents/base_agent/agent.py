@@ -5,22 +5,70 @@ from dotenv import load_dotenv
 import yt_dlp
 from yt_dlp.utils import download_range_func
 from youtube_search import YoutubeSearch
-from typing import cast, Any, Dict
+from typing import cast, Any, Dict, Callable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import threading
+import time
 
 load_dotenv() # load environment variables
 
-# searches youtube for a video related to the given query
-# returns either a valid youtube URL or an empty string
-def video_search(query: str) -> str:
-    """
-    Searches youtube for a video matching the given query.
+# where downloaded clips go; every (url, start, end) gets its own file
+DOWNLOAD_DIR = os.environ.get("DANCE_DOWNLOAD_DIR", "downloads")
 
-    Args:
-        query (str): the given information to search youtube for
+# cache lifetimes in seconds
+SEARCH_TTL = 24 * 3600
+TIMESTAMPS_TTL = 7 * 24 * 3600
+DOWNLOAD_TTL = 30 * 24 * 3600
+
+
+# small thread-safe cache whose entries expire after a fixed time
+class TTLCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._data: Dict[Any, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            if time.time() - hit[0] > self.ttl:
+                del self._data[key]
+                return None
+            return hit[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+search_cache = TTLCache(SEARCH_TTL)         # query -> url
+timestamps_cache = TTLCache(TIMESTAMPS_TTL) # url -> (start, end)
+download_cache = TTLCache(DOWNLOAD_TTL)     # (url, start, end) -> file path
+
+# one lock per clip so two jobs asking for the same clip download it once
+_clip_locks: Dict[str, threading.Lock] = {}
+_clip_locks_guard = threading.Lock()
+
+
+def _clip_lock(job_id: str) -> threading.Lock:
+    with _clip_locks_guard:
+        return _clip_locks.setdefault(job_id, threading.Lock())
 
-    Returns:
-        str: either a valid youtube url or an empty string.
-    """
+
+def clip_job_id(url: str, start: Optional[int], end: Optional[int]) -> str:
+    return hashlib.sha1(f"{url}|{start}|{end}".encode()).hexdigest()[:16]
+
+
+# searches youtube and returns a URL (or an empty string)
+def youtube_search(query: str) -> str:
 
     # set up the string for the youtube URL
     videoURL = "https://youtube.com/watch?v="
@@ -40,6 +88,72 @@ def video_search(query: str) -> str:
 
     return videoURL
 
+
+# downloads [start, end] of a youtube video to out_path (without extension)
+# and returns the path of the written mp4
+def youtube_download(url: str, start: Optional[int], end: Optional[int], out_path: str) -> str:
+    # setting up download settings
+    yt_opts = {
+        'verbose': True,
+        'force_keyframes_at_cuts': True,
+        'outtmpl': out_path, # file name
+        'merge_output_format': "mp4", # file extension
+    }
+    if start is not None and end is not None:
+        yt_opts['download_ranges'] = download_range_func(None, [(start, end)]) # timeframe of video that should be downloaded
+
+    # download the given video
+    with yt_dlp.YoutubeDL(yt_opts) as ydl:
+        ydl.download(url)
+    return out_path + ".mp4"
+
+
+# the tools the pipeline runs; swap them with set_tools() to run without network
+_tools: Dict[str, Callable] = {
+    "search": youtube_search,
+    "download": youtube_download,
+    # url -> (start, end) before downloading; None downloads the whole video and the
+    # dancing is trimmed locally when the reference is extracted (backend/trim.py)
+    "analyze": None,
+}
+
+
+def set_tools(search: Optional[Callable] = None, download: Optional[Callable] = None,
+              analyze: Optional[Callable] = None):
+    """
+    Replace the search / download / timestamp-analysis steps, e.g. with local
+    stand-ins in tests. Caches are cleared so results from other tools do not leak.
+    """
+    if search is not None:
+        _tools["search"] = search
+    if download is not None:
+        _tools["download"] = download
+    if analyze is not None:
+        _tools["analyze"] = analyze
+    search_cache.clear()
+    timestamps_cache.clear()
+    download_cache.clear()
+
+
+# searches youtube for a video related to the given query
+# returns either a valid youtube URL or an empty string
+def video_search(query: str) -> str:
+    """
+    Searches youtube for a video matching the given query.
+
+    Args:
+        query (str): the given information to search youtube for
+
+    Returns:
+        str: either a valid youtube url or an empty string.
+    """
+    url = search_cache.get(query)
+    if url is None:
+        url = _tools["search"](query)
+        if url:
+            search_cache.put(query, url)
+    return url or ""
+
 # agent to pull up a video of the dance desired
 video_search_agent = Agent(
     name = "VideoSearchAgent",
@@ -54,66 +168,85 @@ video_search_agent = Agent(
     output_key = "video_link",
 )
 
-# agent to find the timestanps where dancing starts and stops to cut filler out of the video
-video_process_agent = Agent(
-    name = "VideoProcessAgent",
-    model = "gemini-2.5-flash",
-    description = "Analyses given YouTube URL and returns the time that dancing starts, as well as the time that dancing ends.",
-    instruction = """You are an expert video analyzer.
-
-    ** Task **
-    Your task is to use the given YouTube URL, which contains a video of a dance, to find two points:
-    1. The point at which the dancing begins, as an integer.
-    2. The point at which the dancing ends, as an integer.
-
-    ** Video to Review **
-    {video_link}
-
-    ** Output ** 
-    "Return these two values along with the URL in a list in the following format: [URL, start_point, end_point].""",
-    output_key = "video_info_list",
-)
-
 # downloads a youtube video within a given timestamp using a valid youtube url.
 # used as a tool by video_download_agent
-def video_download(url: str, start: int, end: int):
+def video_download(url: str, start: Optional[int] = None, end: Optional[int] = None) -> str:
     """
-    Runs a function to download a video within a given timeframe.
+    Runs a function to download a video, optionally only within a given timeframe.
 
     Args:
         url (str): the URL of the video that will be downloaded
-        start (int): the beginning of the timeframe of said video that will be downloaded.
-        end (int): the end of the timeframe of said video that will be downloaded.
+        start (int, optional): the beginning of the timeframe of said video that will be downloaded.
+        end (int, optional): the end of the timeframe of said video that will be downloaded.
+
+    Returns:
+        str: the path of the downloaded clip.
     """
+    key = (url, start, end)
+    path = download_cache.get(key)
+    if path and os.path.exists(path):
+        return path
 
+    job_id = clip_job_id(url, start, end)
+    with _clip_lock(job_id):
+        # another job may have finished this clip while we waited
+        path = download_cache.get(key)
+        if path and os.path.exists(path):
+            return path
+        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+        path = _tools["download"](url, start, end, os.path.join(DOWNLOAD_DIR, job_id))
+        download_cache.put(key, path)
+    return path
 
-    # setting up download settings
-    yt_opts = {
-        'verbose': True,
-        'force_keyframes_at_cuts': True,
-        'outtmpl': "test", # file name
-        'merge_output_format': "mp4", # file extension
-        'download_ranges': download_range_func(None, [(start, end)]), # timeframe of video that should be downloaded
-    }
 
-    # download the given video
-    with yt_dlp.YoutubeDL(yt_opts) as ydl:
-        ydl.download(url)
+# finds where the dancing starts and ends, memoised per url
+def video_timestamps(url: str) -> Tuple[Optional[int], Optional[int]]:
+    hit = timestamps_cache.get(url)
+    if hit is not None:
+        return hit
+    analyze = _tools["analyze"]
+    span = analyze(url) if analyze is not None else (None, None)
+    timestamps_cache.put(url, span)
+    return span
+
+
+# runs search -> timestamps -> download for one query without the LLM agents
+def acquire_dance(query: str) -> Dict[str, Any]:
+    t0 = time.time()
+    url = video_search(query)
+    if not url:
+        return {"query": query, "ok": False, "error": "no video found"}
+    start, end = video_timestamps(url)
+    path = video_download(url, start, end)
+    return {"query": query, "ok": True, "url": url, "start": start, "end": end,
+            "path": path, "seconds": round(time.time() - t0, 3)}
+
+
+# runs independent acquisition jobs concurrently; results keep the input order
+def acquire_dances(queries: List[str], max_workers: int = 4) -> List[Dict[str, Any]]:
+    def job(q):
+        try:
+            return acquire_dance(q)
+        except Exception as e:
+            return {"query": q, "ok": False, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(job, queries))
 
 
 # agent that calls the video_download tool to install a youtube video
 video_download_agent = Agent(
     name = "VideoDownloadAgent",
     model = "gemini-2.5-flash",
-    description = "Call video_download function using the given list.",
+    description = "Call video_download function using the given URL.",
     instruction = """You are an expert function caller.
     
     ** Task **
-    Your task is to use the list provided to you in the format of [url, start_point, end_point] to call the video_download tool.
-    An example call to the tool looks like: video_download(url, start_point, end_point)
+    Your task is to use the YouTube URL provided to you to call the video_download tool.
+    An example call to the tool looks like: video_download(url)
 
-    ** List **
-    {video_info_list}
+    ** URL **
+    {video_link}
     
     ** Output **
     Return either 'Success' if the tool executed without error, or 'Failure' if an error was enountered.""",
@@ -122,11 +255,12 @@ video_download_agent = Agent(
 )
 
 
-# sequential agent that will ensure the process of searching for and installing a youtube video is done in sequential steps
+# sequential agent that will ensure the process of searching for and installing a youtube video is done in sequential steps.
+# where the dancing starts and ends is found locally from the downloaded clip (backend/trim.py)
 video_pipeline_agent = SequentialAgent(
     name = "VideoPipelineAgent",
-    sub_agents = [video_search_agent, video_process_agent, video_download_agent],
-    description = "Executes a series of video searching, analyzing, and downloading.",
+    sub_agents = [video_search_agent, video_download_agent],
+    description = "Executes a series of video searching and downloading.",
 )
 
 # ensure a root_agent exists to be called upon
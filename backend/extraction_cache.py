@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+# Content-addressed cache for process_reference_video results.
+#
+# Layout:  <root>/<video sha256[:20]>_<params sha1[:12]>/frames.json
+# Each entry holds the frame ranges that were actually decoded ("ranges", half-open,
+# in source frame indices) plus every pose frame found inside them, so a different
+# start/end trim of the same source only has to process the frames not yet covered.
+#
+# Detected active ranges (trim.find_active_range) are memoised in <root>/trims.json
+# under the same video digest plus the trim parameters, so an auto-trimmed rerun
+# does not decode the clip again just to find where to start.
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ref_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+HASH_CHUNK = 1 << 20
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def params_digest(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def merge_ranges(ranges):
+    out = []
+    for a, b in sorted(ranges):
+        if out and a <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], b)
+        else:
+            out.append([a, b])
+    return out
+
+
+def missing_ranges(ranges, start, end):
+    """Sub-ranges of [start, end) not covered by the (merged) ranges."""
+    gaps, cur = [], start
+    for a, b in ranges:
+        if b <= cur:
+            continue
+        if a >= end:
+            break
+        if a > cur:
+            gaps.append([cur, min(a, end)])
+        cur = max(cur, b)
+        if cur >= end:
+            break
+    if cur < end:
+        gaps.append([cur, end])
+    return gaps
+
+
+class ExtractionCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._hash_index_path = os.path.join(self.root, "hashes.json")
+        self._trim_index_path = os.path.join(self.root, "trims.json")
+
+    # ---- keys ----
+    def video_digest(self, video_path):
+        """sha256 of the file, memoised on (path, size, mtime) so reruns skip re-hashing."""
+        st = os.stat(video_path)
+        key = os.path.abspath(video_path)
+        index = self._load_json(self._hash_index_path, {})
+        hit = index.get(key)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        digest = file_digest(video_path)
+        index[key] = [st.st_size, st.st_mtime_ns, digest]
+        self._save_json(self._hash_index_path, index)
+        return digest
+
+    def entry_dir(self, video_digest, params):
+        return os.path.join(self.root, f"{video_digest[:20]}_{params_digest(params)[:12]}")
+
+    # ---- entries ----
+    def load(self, video_digest, params):
+        path = os.path.join(self.entry_dir(video_digest, params), "frames.json")
+        entry = self._load_json(path, None)
+        if entry is not None:
+            os.utime(path)  # LRU touch
+        return entry
+
+    def store(self, video_digest, params, entry):
+        d = self.entry_dir(video_digest, params)
+        os.makedirs(d, exist_ok=True)
+        entry["ranges"] = merge_ranges(entry["ranges"])
+        entry["frames"].sort(key=lambda fr: fr["frame_index"])
+        self._save_json(os.path.join(d, "frames.json"), entry)
+        self.evict(keep=d)
+
+    # ---- detected trims ----
+    def load_trim(self, video_digest, trim_params):
+        """Memoised [start_sec, end_sec, duration] for this video and trim parameters, or None."""
+        return self._load_json(self._trim_index_path, {}).get(f"{video_digest}_{params_digest(trim_params)}")
+
+    def store_trim(self, video_digest, trim_params, start, end, duration):
+        index = self._load_json(self._trim_index_path, {})
+        index[f"{video_digest}_{params_digest(trim_params)}"] = [start, end, duration]
+        self._save_json(self._trim_index_path, index)
+
+    # ---- size cap ----
+    def entries(self):
+        out = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name, "frames.json")
+            if os.path.isfile(path):
+                st = os.stat(path)
+                out.append((st.st_mtime, st.st_size, os.path.join(self.root, name)))
+        return out
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, d in entries:
+            if total <= self.max_bytes:
+                break
+            if d == keep:
+                continue
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size
+        return total
+
+    # ---- io ----
+    @staticmethod
+    def _load_json(path, default):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    @staticmethod
+    def _save_json(path, data):
+        tmp = f"{path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
@@ -0,0 +1,201 @@
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import traceback
+
+from videoProcessor import (ADAPTIVE_MOTION_THRESH, DEFAULT_PROFILE, PROFILES,
+                            extract_reference_frames, write_reference_json)
+
+# Batch builder for the reference library: runs extract_reference_frames over many
+# videos on a process pool and writes <out>/<name>.json for each, plus
+# <out>/manifest.json with the status, timings and frame counts of every item.
+#
+# Rerunning skips items whose manifest entry is "done" for the same source file
+# (size + mtime), trim and extraction options, as long as the output still exists;
+# failed items are retried. The manifest is rewritten after every finished item, so
+# an interrupted build resumes where it stopped.
+#
+#   python library_builder.py videos/ --out references --workers 4
+#   python library_builder.py library.json --profile pose-full --adaptive-stride 4
+#
+# A manifest input is a JSON list of paths or {"video", "name", "start", "end"} objects
+# (paths relative to the manifest), or a text file with one path per line.
+
+VIDEO_EXTS = (".mp4", ".mov", ".mkv", ".webm", ".avi", ".m4v")
+MANIFEST_NAME = "manifest.json"
+
+
+# ---------- inputs ----------
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "dance"
+
+
+def load_jobs(source):
+    """Directory or manifest file -> list of {"video", "name", "start", "end"}."""
+    if os.path.isdir(source):
+        items = [os.path.join(source, n) for n in sorted(os.listdir(source))
+                 if n.lower().endswith(VIDEO_EXTS)]
+        base = None
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source) as f:
+            text = f.read()
+        if source.lower().endswith(".json"):
+            items = json.loads(text)
+        else:
+            items = [ln.strip() for ln in text.splitlines() if ln.strip() and not ln.startswith("#")]
+
+    jobs, names = [], set()
+    for it in items:
+        job = {"video": it} if isinstance(it, str) else dict(it)
+        if base and not os.path.isabs(job["video"]):
+            job["video"] = os.path.join(base, job["video"])
+        name = _slug(job.get("name") or os.path.splitext(os.path.basename(job["video"]))[0])
+        if name in names:
+            name += "-" + hashlib.sha1(job["video"].encode()).hexdigest()[:6]
+        names.add(name)
+        jobs.append({"video": job["video"], "name": name,
+                     "start": job.get("start"), "end": job.get("end"), "title": job.get("title")})
+    return jobs
+
+
+# ---------- manifest ----------
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"items": {}}
+
+
+def save_manifest(path, manifest):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _source_stamp(video):
+    st = os.stat(video)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def is_done(entry, job, options, out_dir):
+    if not entry or entry.get("status") != "done":
+        return False
+    try:
+        stamp = _source_stamp(job["video"])
+    except OSError:
+        return False
+    return (entry.get("source") == stamp
+            and entry.get("trim") == [job["start"], job["end"]]
+            and entry.get("options") == options
+            and os.path.isfile(os.path.join(out_dir, entry["output"])))
+
+
+# ---------- worker ----------
+def build_one(job, options, out_dir):
+    """Runs in a pool worker; never raises, returns the manifest entry."""
+    t0 = time.time()
+    entry = {"video": job["video"], "output": job["name"] + ".json",
+             "trim": [job["start"], job["end"]], "options": options, "started": t0}
+    try:
+        entry["source"] = _source_stamp(job["video"])
+        frames, fps, total = extract_reference_frames(job["video"], job["start"], job["end"], **options)
+        if not fps or total <= 0:
+            raise ValueError("no decodable frames")
+        if not frames:
+            raise ValueError("no pose found")
+        write_reference_json(os.path.join(out_dir, entry["output"]), frames, fps, total,
+                             title=job["title"] or job["name"])
+        entry.update(status="done", fps=fps, frames=total, pose_frames=len(frames),
+                     duration_sec=round(total / fps, 3) if fps else None)
+    except Exception as e:
+        entry.update(status="failed", error=f"{type(e).__name__}: {e}",
+                     traceback=traceback.format_exc(limit=5))
+    entry["seconds"] = round(time.time() - t0, 3)
+    return entry
+
+
+# ---------- driver ----------
+def build_library(source, out_dir="references", workers=None, force=False, **options):
+    """
+    Process every video of `source` into out_dir. options go to extract_reference_frames
+    (profile, sample_every, adaptive_stride, motion_thresh, cache, ...).
+    Returns the manifest.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    items = manifest.setdefault("items", {})
+
+    jobs = load_jobs(source)
+    todo = [j for j in jobs if force or not is_done(items.get(j["name"]), j, options, out_dir)]
+    skipped = len(jobs) - len(todo)
+    print(f"{len(jobs)} videos, {skipped} already built, {len(todo)} to process")
+    if not todo:
+        return manifest
+
+    # MediaPipe runs its own threads per model, so one process per two cores is a sane default
+    workers = max(1, min(workers or max(1, (os.cpu_count() or 2) // 2), len(todo)))
+    ctx = multiprocessing.get_context("spawn")
+    t_start = time.time()
+    done = failed = frames = 0
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=ctx) as pool:
+        futures = {pool.submit(build_one, j, options, out_dir): j for j in todo}
+        for fut in concurrent.futures.as_completed(futures):
+            job = futures[fut]
+            try:
+                entry = fut.result()
+            except Exception as e:  # worker died (e.g. killed by the OOM killer)
+                entry = {"video": job["video"], "output": job["name"] + ".json",
+                         "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            items[job["name"]] = entry
+            manifest["updated"] = time.time()
+            save_manifest(manifest_path, manifest)
+
+            if entry["status"] == "done":
+                done += 1
+                frames += entry["frames"]
+            else:
+                failed += 1
+            elapsed = max(1e-6, time.time() - t_start)
+            status = (f"{entry['frames']} frames in {entry['seconds']:.1f}s" if entry["status"] == "done"
+                      else "FAILED " + entry["error"])
+            print(f"[{done + failed}/{len(todo)}] {job['name']}: {status} | "
+                  f"{(done + failed) / elapsed * 60:.1f} videos/min, {frames / elapsed:.1f} frames/s")
+
+    elapsed = time.time() - t_start
+    print(f"built {done}, failed {failed}, skipped {skipped} in {elapsed:.1f}s with {workers} workers "
+          f"({done / max(elapsed, 1e-6) * 60:.1f} videos/min, {frames / max(elapsed, 1e-6):.1f} frames/s)")
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Build the reference library from a directory or manifest of videos.")
+    ap.add_argument("source", help="directory of videos, or a .json / .txt manifest")
+    ap.add_argument("--out", default="references")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(PROFILES))
+    ap.add_argument("--sample-every", type=int, default=1)
+    ap.add_argument("--adaptive-stride", type=int, default=None)
+    ap.add_argument("--motion-thresh", type=float, default=ADAPTIVE_MOTION_THRESH)
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument("--no-trim", action="store_true",
+                    help="process whole clips instead of the detected active range (items without start/end)")
+    ap.add_argument("--force", action="store_true", help="rebuild items that are already done")
+    args = ap.parse_args()
+
+    opts = {"profile": args.profile, "sample_every": args.sample_every, "cache": not args.no_cache,
+            "auto_trim": not args.no_trim}
+    if args.adaptive_stride:
+        opts.update(adaptive_stride=args.adaptive_stride, motion_thresh=args.motion_thresh)
+    result = build_library(args.source, args.out, args.workers, args.force, **opts)
+    sys.exit(1 if any(e.get("status") == "failed" for e in result["items"].values()) else 0)
@@ -0,0 +1,62 @@
+# server/broadcast.py
+# One producer, many streaming clients: a single loop samples at a fixed rate and
+# builds each payload once; every subscriber (an SSE response generator) blocks in
+# events() and gets the newest payload, instead of each client running its own
+# poll-and-serialize loop. A slow client skips to the newest payload (its seq jumps).
+#
+# The loop starts with the first subscriber and exits when the last one leaves.
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+
+class Broadcast:
+    def __init__(self, hz: float, sample: Callable[[int], Optional[str]]):
+        """sample(seq) -> payload for event `seq`, or None when nothing worth sending changed."""
+        self.period = 1.0 / hz
+        self._sample = sample
+        self._cv = threading.Condition()
+        self._seq = 0
+        self._payload = None
+        self._subscribers = 0
+        self._thread = None
+
+    def _run(self):
+        next_t = time.perf_counter()
+        while True:
+            with self._cv:
+                if self._subscribers == 0:
+                    self._thread = None
+                    return
+            payload = self._sample(self._seq)
+            if payload is not None:
+                with self._cv:
+                    self._payload = payload
+                    self._seq += 1
+                    self._cv.notify_all()
+            next_t += self.period
+            wait = next_t - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                next_t = time.perf_counter()
+
+    def events(self, heartbeat_sec: float) -> Iterator[Optional[str]]:
+        """Payloads as they are published; None after heartbeat_sec without one."""
+        with self._cv:
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="broadcast", daemon=True)
+                self._thread.start()
+            last = self._seq - 1 if self._payload is not None else self._seq  # newest one first
+        try:
+            while True:
+                with self._cv:
+                    fresh = self._cv.wait_for(lambda: self._seq > last, heartbeat_sec)
+                    if fresh:
+                        last = self._seq
+                    payload = self._payload if fresh else None
+                yield payload
+        finally:
+            with self._cv:
+                self._subscribers -= 1
@@ -0,0 +1,79 @@
+# server/frame_source.py
+# Camera stand-ins for load testing and headless runs: a synthetic pattern or a video
+# file played in a loop, both paced to the requested fps and read like cv2.VideoCapture.
+import time
+import cv2
+import numpy as np
+
+
+class _PacedSource:
+    def __init__(self, fps):
+        self.frame_interval = 1.0 / max(1e-3, fps)
+        self._next = time.time()
+        self._open = True
+
+    def _pace(self):
+        now = time.time()
+        if now < self._next: time.sleep(self._next - now)
+        self._next = max(self._next + self.frame_interval, time.time() - self.frame_interval)
+
+    def isOpened(self):
+        return self._open
+
+    def release(self):
+        self._open = False
+
+    def set(self, prop, value):
+        return False
+
+
+class SyntheticCapture(_PacedSource):
+    """Moving gradient with a frame counter; costs almost nothing to produce."""
+
+    def __init__(self, width=1280, height=720, fps=30):
+        super().__init__(fps)
+        self.w, self.h = width, height
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        self._row = np.tile(x, (height, 1))
+        self._n = 0
+
+    def read(self):
+        if not self._open: return False, None
+        self._pace()
+        shift = (self._n * 4) % self.w
+        g = np.roll(self._row, shift, axis=1).astype(np.uint8)
+        frame = cv2.merge([g, np.full_like(g, 60), 255 - g])
+        cv2.putText(frame, str(self._n), (24, self.h - 24), cv2.FONT_HERSHEY_SIMPLEX, 1.0,
+                    (255, 255, 255), 2)
+        self._n += 1
+        return True, frame
+
+
+class LoopingFileCapture(_PacedSource):
+    """A video file restarted at EOF, paced to its own fps (or `fps` if given)."""
+
+    def __init__(self, path, fps=None):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened(): raise RuntimeError(f"cannot open {path}")
+        super().__init__(fps or self.cap.get(cv2.CAP_PROP_FPS) or 30)
+
+    def read(self):
+        if not self._open: return False, None
+        self._pace()
+        ok, frame = self.cap.read()
+        if not ok:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+        return ok, frame
+
+    def release(self):
+        super().release()
+        self.cap.release()
+
+
+def open_frame_source(spec: str, width: int, height: int, fps: float):
+    """'synthetic' or a video file path."""
+    if spec == "synthetic":
+        return SyntheticCapture(width, height, fps)
+    return LoopingFileCapture(spec)
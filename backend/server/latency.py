@@ -0,0 +1,51 @@
+# server/latency.py
+# Glass-to-glass tracing for the MJPEG and SSE streams.
+#
+# Every multipart part carries its own headers so a client that parses the stream
+# (frontend/src/services/latencyCollector.js) can measure capture -> render delay
+# and spot dropped frames:
+#   X-Frame-Seq   per-response sequence number, +1 per part
+#   X-Capture-Ts  wall-clock ms when the source frame was read (or sampled, for /video_ref)
+#   X-Infer-Ts    ms when pose inference + scoring for it finished
+#   X-Encode-Ts   ms when the JPEG was ready
+# Plain <img> viewers ignore the extra headers.
+import threading
+import time
+
+_ms = lambda t: f"{t * 1000.0:.3f}".encode()
+
+
+def mjpeg_part(jpeg: bytes, seq: int, t_capture: float, t_infer: float, t_encode: float) -> bytes:
+    return b"".join([
+        b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: ", str(len(jpeg)).encode(),
+        b"\r\nX-Frame-Seq: ", str(seq).encode(),
+        b"\r\nX-Capture-Ts: ", _ms(t_capture),
+        b"\r\nX-Infer-Ts: ", _ms(t_infer),
+        b"\r\nX-Encode-Ts: ", _ms(t_encode),
+        b"\r\n\r\n", jpeg, b"\r\n",
+    ])
+
+
+class LatencyReports:
+    """Latest client report per (client, stream), as posted to /latency."""
+
+    FIELDS = ("frames", "rendered", "gaps", "skipped", "p50_ms", "p90_ms", "p99_ms", "max_ms",
+              "server_ms", "window_sec")
+
+    def __init__(self, max_age=60.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._latest = {}
+
+    def add(self, client: str, stream: str, report: dict):
+        row = {k: report[k] for k in self.FIELDS if k in report}
+        with self._lock:
+            self._latest[(client, stream)] = (time.time(), row)
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (t, _) in self._latest.items() if now - t > self.max_age]:
+                del self._latest[key]
+            return [{"client": c, "stream": s, "age_sec": round(now - t, 1), **row}
+                    for (c, s), (t, row) in sorted(self._latest.items())]
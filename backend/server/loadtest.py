@@ -0,0 +1,224 @@
+# server/loadtest.py
+# Localhost load test for the streaming endpoints.
+#
+# Starts the app under uvicorn with a synthetic or file frame source, then ramps up
+# concurrent MJPEG (/video_live, /video_ref) and SSE (/metrics) clients. Each step
+# reports per-client delivered FPS and inter-frame jitter, plus server CPU and RSS,
+# and flags the step where throughput collapses.
+#
+#   python -m backend.server.loadtest --source synthetic --steps 1,2,4,8 --slow 1
+#   python -m backend.server.loadtest --source frontend/public/videos/ZekeStep.mp4 --json out.json
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BOUNDARY = b"--frame\r\n"
+
+
+# ---------- server process ----------
+def start_server(port, source, extra_env=None):
+    env = dict(os.environ, FRAME_SOURCE=source, RECORD_SESSIONS="0", **(extra_env or {}))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.server.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc
+        except OSError:
+            time.sleep(0.25)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+class ProcSampler:
+    """CPU% and RSS of a process from /proc (Linux)."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self._tick = os.sysconf("SC_CLK_TCK")
+        self._last = None
+
+    def _cpu_ticks(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            parts = f.read().rsplit(")", 1)[1].split()
+        return int(parts[11]) + int(parts[12])  # utime + stime
+
+    def rss_mb(self):
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+        return float("nan")
+
+    def cpu_percent(self):
+        now, ticks = time.time(), self._cpu_ticks()
+        last, self._last = self._last, (now, ticks)
+        if last is None: return float("nan")
+        return 100.0 * (ticks - last[1]) / self._tick / max(1e-6, now - last[0])
+
+
+# ---------- clients ----------
+class StreamClient(threading.Thread):
+    """
+    Reads one streaming endpoint and timestamps each delivered part. read_bps limits
+    how fast the client drains the socket (0 = as fast as possible) to model slow viewers.
+    """
+
+    def __init__(self, port, path, marker, read_bps=0, chunk=16384):
+        super().__init__(daemon=True)
+        self.port, self.path, self.marker = port, path, marker
+        self.read_bps, self.chunk = read_bps, chunk
+        self.arrivals = []
+        self.bytes = 0
+        self.error = None
+        self._halt = threading.Event()
+
+    def run(self):
+        conn = None
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+            conn.request("GET", self.path)
+            resp = conn.getresponse()
+            tail = b""
+            t0 = time.time()
+            while not self._halt.is_set():
+                data = resp.read1(self.chunk)
+                if not data: break
+                self.bytes += len(data)
+                buf = tail + data
+                now = time.time()
+                self.arrivals.extend([now] * buf.count(self.marker))
+                tail = buf[-(len(self.marker) - 1):]
+                if self.read_bps:
+                    wait = self.bytes / self.read_bps - (time.time() - t0)
+                    if wait > 0: time.sleep(wait)
+        except Exception as e:
+            self.error = repr(e)
+        finally:
+            if conn is not None: conn.close()
+
+    def stop(self):
+        self._halt.set()
+
+    def summary(self, t_from, t_to):
+        ts = [t for t in self.arrivals if t_from <= t <= t_to]
+        gaps = [b - a for a, b in zip(ts, ts[1:])]
+        fps = (len(ts) - 1) / (ts[-1] - ts[0]) if len(ts) > 1 and ts[-1] > ts[0] else 0.0
+        return {
+            "path": self.path,
+            "read_bps": self.read_bps,
+            "fps": round(fps, 2),
+            "jitter_ms": round(1000 * statistics.pstdev(gaps), 2) if len(gaps) > 1 else None,
+            "gap_p95_ms": round(1000 * sorted(gaps)[int(0.95 * (len(gaps) - 1))], 2) if gaps else None,
+            "error": self.error,
+        }
+
+
+def run_step(port, sampler, n, mix, slow, slow_bps, duration, warmup):
+    clients = []
+    for i in range(n):
+        path = mix[i % len(mix)]
+        marker = b"data: " if path.startswith("/metrics") else BOUNDARY
+        bps = slow_bps if i < slow else 0
+        clients.append(StreamClient(port, path, marker, bps))
+    for c in clients: c.start()
+    time.sleep(warmup)
+    sampler.cpu_percent()
+    t_from = time.time()
+    cpu, rss = [], []
+    while time.time() - t_from < duration:
+        time.sleep(1.0)
+        cpu.append(sampler.cpu_percent())
+        rss.append(sampler.rss_mb())
+    t_to = time.time()
+    for c in clients: c.stop()
+    per_client = [c.summary(t_from, t_to) for c in clients]
+    for c in clients: c.join(timeout=2)
+
+    video = [c for c in per_client if not c["path"].startswith("/metrics")]
+    fast = [c["fps"] for c in video if not c["read_bps"]]
+    return {
+        "clients": n,
+        "delivered_fps_total": round(sum(c["fps"] for c in video), 2),
+        "fast_client_fps_median": round(statistics.median(fast), 2) if fast else None,
+        "server_cpu_pct": round(statistics.mean(cpu), 1) if cpu else None,
+        "server_rss_mb": round(max(rss), 1) if rss else None,
+        "per_client": per_client,
+    }
+
+
+def find_collapse(steps, frac):
+    """First step where fast clients get < frac of the single-client rate, or total throughput drops."""
+    base = steps[0]["fast_client_fps_median"] if steps else None
+    best_total = 0.0
+    for st in steps:
+        med = st["fast_client_fps_median"]
+        if base and med is not None and med < frac * base:
+            return st["clients"]
+        if st["delivered_fps_total"] < best_total * 0.9:
+            return st["clients"]
+        best_total = max(best_total, st["delivered_fps_total"])
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Localhost load test for the streaming endpoints.")
+    ap.add_argument("--source", default="synthetic", help="'synthetic' or a video file path")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--steps", default="1,2,4,8", help="client counts to ramp through")
+    ap.add_argument("--mix", default="/video_live,/video_ref,/metrics",
+                    help="endpoints assigned round-robin to clients")
+    ap.add_argument("--slow", type=int, default=0, help="clients per step that read slowly")
+    ap.add_argument("--slow-bps", type=int, default=200_000, help="read rate of slow clients, bytes/sec")
+    ap.add_argument("--duration", type=float, default=10.0, help="measured seconds per step")
+    ap.add_argument("--warmup", type=float, default=3.0)
+    ap.add_argument("--collapse-frac", type=float, default=0.5)
+    ap.add_argument("--play", action="store_true", help="start playback (/control?play=1) first")
+    ap.add_argument("--json", help="write the full report here")
+    args = ap.parse_args()
+
+    proc = start_server(args.port, args.source)
+    try:
+        if args.play:
+            c = http.client.HTTPConnection("127.0.0.1", args.port, timeout=5)
+            c.request("GET", "/control?play=1")
+            c.getresponse().read()
+            c.close()
+        sampler = ProcSampler(proc.pid)
+        mix = args.mix.split(",")
+        steps = []
+        print(f"{'clients':>8}{'total fps':>11}{'fast fps':>10}{'cpu %':>8}{'rss MB':>8}{'worst jitter ms':>17}")
+        for n in [int(x) for x in args.steps.split(",")]:
+            st = run_step(args.port, sampler, n, mix, args.slow, args.slow_bps, args.duration, args.warmup)
+            steps.append(st)
+            jit = [c["jitter_ms"] for c in st["per_client"] if c["jitter_ms"] is not None]
+            print(f"{n:>8}{st['delivered_fps_total']:>11}{str(st['fast_client_fps_median']):>10}"
+                  f"{str(st['server_cpu_pct']):>8}{str(st['server_rss_mb']):>8}{str(max(jit) if jit else None):>17}")
+        collapse = find_collapse(steps, args.collapse_frac)
+        print("throughput collapse at:", f"{collapse} clients" if collapse else "not reached")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"args": vars(args), "steps": steps, "collapse_at": collapse}, f, indent=2)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+if __name__ == "__main__":
+    main()
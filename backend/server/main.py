@@ -1,14 +1,27 @@
 # server/main.py
-import os, sys, cv2, json, time
+import os, sys, cv2, json, time, hmac, contextlib
 import numpy as np
 from collections import deque
 from typing import List
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 import mediapipe as mp
 import threading
 from backend import videoProcessor
+from backend.server import retarget
+from backend.server.telemetry import SessionTelemetry
+from backend.server.predict import LandmarkPredictor
+from backend.server.pose_pool import PosePool
+from backend.server.recording import SessionRecorder, SessionReader
+from backend.server.frame_source import open_frame_source
+from backend.server import remote_pose
+from backend.server import profiling
+from backend.server.latency import mjpeg_part, LatencyReports
+from backend.server.scores import ScoreStore
+from backend.server.timeline import Timeline
+from backend.server.broadcast import Broadcast
 
 # ---------------- knobs ----------------
 TARGET_FPS = 60
@@ -18,10 +31,42 @@ POSE_COMPLEXITY = 1
 SMOOTH_LANDMARKS = True
 MIN_VIS = 0.20
 
+# predictive tracking: real inference every PREDICT_INFER_EVERY frames, constant-velocity
+# prediction in between unless the frame-difference probe sees sudden motion.
+# Opt-in until the ghost lag has been measured against per-frame inference on real footage.
+PREDICT_LANDMARKS = os.environ.get("PREDICT_LANDMARKS", "0") == "1"
+PREDICT_INFER_EVERY = 2
+PREDICT_MOTION_THRESH = 10.0
+PREDICT_MAX_GAP = 3
+
+# pose inference in worker processes (0 = in-process); frames travel via shared memory
+POSE_WORKERS = int(os.environ.get("POSE_WORKERS", "0"))
+POSE_POOL_SLOTS = 8
+POSE_PIPELINE_DEPTH = 2  # frames a station may have in flight before it waits
+
+# every played session is logged for replay / rescoring
+RECORD_SESSIONS = os.environ.get("RECORD_SESSIONS", "1") == "1"
+RECORD_DIR = os.environ.get("RECORD_DIR", "recordings")
+REPLAY_MAX_W = 960
+
+# finished sessions (score, accuracy, player, dance) for leaderboards and history
+SCORES_DB = os.environ.get("SCORES_DB", "scores.db")
+SCORES_FLUSH_SEC = 2.0  # longest /control?play=0 waits for the session to be committed
+
 LM_EMA_ALPHA_POS = 0.35
 LM_EMA_ALPHA_MISS_DECAY = 0.85
 SMOOTH_TRANSFORM_ALPHA = 0.25
 
+CALIB_HOLD_SEC = 2.5  # T-pose must be held this long
+TRACK_SCALE_ALPHA = 0.15  # post-calibration distance-to-camera tracking
+
+TELEMETRY_CAPACITY = TARGET_FPS * 60 * 10  # ~10 min of scored frames
+METRICS_MAX_HZ = 10
+# changes are compared at display precision: accuracy in steps of this many points,
+# score as an integer
+METRICS_ACC_STEP = 0.5
+METRICS_HEARTBEAT_SEC = 2.0
+
 COACH_W, COACH_H = 320, 540
 COACH_PANEL_TARGET_HEIGHT_FRAC = 0.52
 
@@ -32,6 +77,15 @@ WARMUP_FRAMES = 6
 READ_FAIL_REOPEN = 20
 OPEN_RETRY_SLEEP = 0.35
 
+# "camera" (default), "synthetic" or a video file path; used by the load tester
+FRAME_SOURCE = os.environ.get("FRAME_SOURCE", "camera")
+SOURCE_W, SOURCE_H, SOURCE_FPS = 1280, 720, 30
+
+# /admin/profile; the admin endpoints are disabled unless ADMIN_TOKEN is set, and then
+# require ?token=
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
 
 # --------------------------------------
 
@@ -119,6 +173,8 @@ def _try_open_with_backend(index: int, backend) -> cv2.VideoCapture | None:
 
 
 def _open_cam() -> cv2.VideoCapture:
+    if FRAME_SOURCE != "camera":
+        return open_frame_source(FRAME_SOURCE, SOURCE_W, SOURCE_H, SOURCE_FPS)
     for _ in range(MAX_OPEN_TRIES):
         for idx in PROBE_INDICES:
             for backend in OPEN_BACKENDS:
@@ -144,6 +200,43 @@ def lm_to_px(landmarks, W, H, min_vis=MIN_VIS):
     return pts, vis
 
 
+def lm_array_to_px(arr, W, H, min_vis=MIN_VIS):
+    """lm_to_px for a (33, 4) [x, y, z, visibility] array, e.g. from the pose pool."""
+    vis = arr[:, 3].astype(np.float32)
+    pts = arr[:, :2] * np.array([W, H], np.float32)
+    pts[vis < min_vis] = np.nan
+    return pts.astype(np.float32), vis
+
+
+_pose_pool = None
+_pose_pool_lock = threading.Lock()
+
+
+def get_pose_pool():
+    global _pose_pool
+    with _pose_pool_lock:
+        if _pose_pool is None and POSE_WORKERS > 0:
+            _pose_pool = PosePool(POSE_WORKERS, CAM_W, CAM_H, POSE_POOL_SLOTS,
+                                  dict(model_complexity=POSE_COMPLEXITY,
+                                       smooth_landmarks=SMOOTH_LANDMARKS,
+                                       enable_segmentation=False,
+                                       min_detection_confidence=0.5,
+                                       min_tracking_confidence=0.5))
+            log(f"pose pool: {POSE_WORKERS} workers")
+        return _pose_pool
+
+
+@app.on_event("shutdown")
+def close_pose_pool():
+    # stops the workers and unlinks the shared-memory ring, which would otherwise
+    # outlive the server in /dev/shm
+    global _pose_pool
+    with _pose_pool_lock:
+        if _pose_pool is not None:
+            _pose_pool.close()
+            _pose_pool = None
+
+
 def centroid_fill(pts: np.ndarray) -> np.ndarray:
     out = pts.copy();
     m = np.isfinite(out).all(axis=1)
@@ -199,6 +292,21 @@ def draw_ghost(img, pts, lc, jc, alpha=COACH_ALPHA):
     cv2.addWeighted(ov, alpha, img, 1 - alpha, 0, img)
 
 
+def lerp_frames(seq: np.ndarray, i: int, j: int, w: float) -> np.ndarray:
+    """Blend frames i and j of a (N, 33, 2) sequence; joints missing on one side snap to the other."""
+    a, b = seq[i], seq[j]
+    if w <= 0.0 or i == j: return a.copy()
+    out = (1.0 - w) * a + w * b
+    out = np.where(np.isfinite(a), out, b)
+    return np.where(np.isfinite(b), out, a).astype(np.float32)
+
+
+def cursor_index(cursor) -> int:
+    """Nearest stored frame for a (i, j, w) reference cursor."""
+    i, j, w = cursor
+    return i if w < 0.5 else j
+
+
 # ---- height/width helpers ----
 EYES = [PLM.LEFT_EYE.value, PLM.RIGHT_EYE.value]
 ANKLES = [PLM.LEFT_ANKLE.value, PLM.RIGHT_ANKLE.value]
@@ -302,14 +410,23 @@ def compute_angles(pts):
     return ang
 
 
+ANGLE_WEIGHTS = {
+    "leftElbow": 1.0, "rightElbow": 1.0,
+    "leftKnee": 1.5, "rightKnee": 1.5,
+    "leftHip": 1.5, "rightHip": 1.5,
+    "leftShoulder": 1.2, "rightShoulder": 1.2,
+    "torsoTilt": 2.0,
+}
+JOINT_KEYS = list(ANGLE_WEIGHTS)
+
+
+def angle_errors(live, ref) -> np.ndarray:
+    """Absolute per-joint angle error in JOINT_KEYS order (NaN where undetected)."""
+    return np.array([abs(live.get(k, np.nan) - ref.get(k, np.nan)) for k in JOINT_KEYS], np.float32)
+
+
 def score_from_angles(live, ref):
-    weights = {
-        "leftElbow": 1.0, "rightElbow": 1.0,
-        "leftKnee": 1.5, "rightKnee": 1.5,
-        "leftHip": 1.5, "rightHip": 1.5,
-        "leftShoulder": 1.2, "rightShoulder": 1.2,
-        "torsoTilt": 2.0,
-    }
+    weights = ANGLE_WEIGHTS
 
     def map_diff(d):
         d = abs(d)
@@ -328,56 +445,310 @@ def score_from_angles(live, ref):
 
 
 # -------------- comparator --------------
+_references = {}  # (abspath, mtime_ns) -> parsed reference, shared by every station
+_references_lock = threading.Lock()
+
+
+def load_reference(path: str) -> dict:
+    """
+    Parse a reference JSON into read-only arrays. Memoised per file version, so
+    stations on the same dance share one copy instead of re-parsing it each.
+    """
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    with _references_lock:
+        hit = _references.get(key)
+    if hit is not None:
+        return hit
+
+    with open(path, "r") as f:
+        ref = json.load(f)
+    raw = ref["frames"]
+    seq = np.full((len(raw), 33, 2), np.nan, np.float32)
+    for k, fr in enumerate(raw):
+        if "landmarks" in fr:
+            for i, lm in enumerate(fr["landmarks"][:33]):
+                if lm.get("visibility", 1.0) >= 0.0:
+                    seq[k, i] = [float(lm["x"]), float(lm["y"])]
+
+    def norm_h(a: np.ndarray):
+        y = [a[i, 1] for i in SCALE_JOINTS if i < len(a) and np.isfinite(a[i]).all()]
+        return float(np.max(y) - np.min(y)) if len(y) >= 2 else 0.6
+
+    good = [h for h in map(norm_h, seq) if h > 0]
+
+    # time index: stored timestamps (frames without a pose were skipped at extraction,
+    # so frame i is not at i / fps), rebased to start at 0
+    fps = ref.get("fps", 30)
+    ts = [fr.get("timestamp", fr.get("frame_index", i) / (fps or 30.0)) for i, fr in enumerate(raw)]
+    t = np.asarray(ts, np.float64) - (ts[0] if ts else 0.0)
+    seq.flags.writeable = False
+    t.flags.writeable = False
+    out = {"fps": fps, "seq": seq, "norm": list(seq), "t": t,
+           "base_h_norm": float(np.median(good)) if good else 0.6,
+           "duration": float(t[-1] + 1.0 / (fps or 30.0)) if ts else 0.0}
+    with _references_lock:
+        for k in [k for k in _references if k[0] == key[0]]:
+            del _references[k]  # older versions of this file
+        _references[key] = out
+    return out
+
+
 class DanceComparison:
-    def __init__(self, reference_json_path: str, playback_speed: float = 0.5):
-        with open(reference_json_path, "r") as f:
-            ref = json.load(f)
-        self.ref_fps = ref.get("fps", 30)
-        raw = ref["frames"]
-
-        self.ref_norm = []
-        for fr in raw:
-            arr = np.full((33, 2), np.nan, np.float32)
-            if "landmarks" in fr:
-                for i, lm in enumerate(fr["landmarks"][:33]):
-                    if lm.get("visibility", 1.0) >= 0.0:
-                        arr[i] = [float(lm["x"]), float(lm["y"])]
-            self.ref_norm.append(arr)
-
-        def norm_h(a: np.ndarray):
-            y = [a[i, 1] for i in SCALE_JOINTS if i < len(a) and np.isfinite(a[i]).all()]
-            return float(np.max(y) - np.min(y)) if len(y) >= 2 else 0.6
-
-        hs = [norm_h(a) for a in self.ref_norm]
-        good = [h for h in hs if h > 0]
-        self.ref_base_h_norm = float(np.median(good)) if good else 0.6
+    def __init__(self, reference_json_path: str, playback_speed: float = 0.5, station: int = 0):
+        self.station = station
+        self.reference_path = reference_json_path
+        ref = load_reference(reference_json_path)
+        self.ref_fps = ref["fps"]
+        self.ref_norm = ref["norm"]  # views into ref_seq; shared, read-only
+        self.ref_seq = ref["seq"]
+        self.ref_base_h_norm = ref["base_h_norm"]
+        self.ref_t = ref["t"]
+        self.ref_duration = ref["duration"]
 
         self.playback_speed = playback_speed
         self.s_hist, self.R_hist, self.t_hist = deque(maxlen=5), deque(maxlen=5), deque(maxlen=5)
         self.live_ema = None
+        self.live_vis = np.zeros(33, np.float32)
+        self.recorder = None
+        self._rec_lock = threading.Lock()
+        self._frame_wh = None  # size of the last scored frame
+        self.predictor = LandmarkPredictor(PREDICT_INFER_EVERY, PREDICT_MOTION_THRESH, PREDICT_MAX_GAP)
+        self._pool_probes = {}  # pool seq -> motion probe of the submitted frame
+        self._pool_found = False  # the newest pool result had a pose
         self.start_time = None
+        self.player = "guest"  # opaque account id, never an email
+        self.player_name = None  # display name for leaderboards
+        self.dance = os.path.splitext(os.path.basename(reference_json_path))[0]
+        self._session_started = None
+        self.timeline = Timeline(TARGET_FPS, self._timeline_tick)
+        self._coach_cache = {}  # (width, height) -> (tick seq, multipart part)
+        self._coach_lock = threading.Lock()
 
         # metrics
         self._score = 0.0
         self._accuracy = 0.0
         self._frames = 0
+        self._acc_sum = 0.0
+        self.telemetry = SessionTelemetry(JOINT_KEYS, TELEMETRY_CAPACITY)
 
         self._play = False
 
         # shoulder width EMA for width-correction
         self._xscale_ema = 1.0
 
+        # calibration: "idle" | "collecting" | "done"
+        self._calib_state = "idle"
+        self._calib_samples = []
+        self._calib_since = None
+        self._ref_fit = None  # (N, 33, 2) reference retargeted to the player, px
+        self._ref_fit_wh = None
+        self._calib_size = np.nan
+        self._track_s = 1.0
+        self._calib_player = None  # whose body the retarget fits; bound at their first session
+
     def _reset_metrics(self):
         self._score = 0.0
         self._accuracy = 0.0
         self._frames = 0
+        self._acc_sum = 0.0
+        self.telemetry.reset()
 
     def set_play(self, flag: bool):
-        was = self._play
-        self._play = bool(flag)
-        if (not was) and self._play:
-            self._reset_metrics()
-            self.start_time = time.time()
+        """Start or stop a session; stopping returns the session queued for the score store."""
+        # control requests run on other threads than the stream; the lock keeps the
+        # recorder from being opened, written and closed at the same time
+        rec = session = None
+        with self._rec_lock:
+            was = self._play
+            self._play = bool(flag)
+            if (not was) and self._play:
+                self._bind_calibration()
+                self._reset_metrics()
+                self.start_time = self._session_started = time.time()
+                if RECORD_SESSIONS: self._open_recorder()
+            if was and not self._play:
+                session = self._save_score()
+                rec, self.recorder = self.recorder, None
+        self._close_recorder(rec)
+        return session
+
+    def session_stats(self) -> dict:
+        """Score, mean per-frame accuracy and scored frames of the current (or last) session."""
+        return {"score": float(self._score), "frames": self._frames,
+                "accuracy": self._acc_sum / self._frames if self._frames else 0.0}
+
+    def _save_score(self):
+        """Queue the finished session for the score store (non-blocking); returns it, or None."""
+        if self._frames == 0 or self._session_started is None: return None
+        session = {"dance": self.dance, "player": self.player, **self.session_stats(),
+                   "started": self._session_started}
+        queued = score_store.submit(session["dance"], session["player"], session["score"],
+                                    session["accuracy"], session["frames"], session["started"],
+                                    station=self.station, player_name=self.player_name,
+                                    recording=os.path.basename(self.recorder.path) if self.recorder else None)
+        return session if queued else None
+
+    # ---- session recording ----
+    def _open_recorder(self):
+        """Called from set_play(True) with _rec_lock held; sized like the last scored frame."""
+        w, h = self._frame_wh or (SOURCE_W, SOURCE_H)
+        name = time.strftime("session-%Y%m%d-%H%M%S") + f"-s{self.station}.mdrec"
+        self.recorder = SessionRecorder(os.path.join(RECORD_DIR, name), w, h, TARGET_FPS,
+                                        {"reference": self.reference_path, "station": self.station,
+                                         "playback_speed": self.playback_speed})
+
+    def _record(self, w, h, idx, live_px, frame_acc):
+        with self._rec_lock:
+            rec = self.recorder
+            if rec is None: return
+            if live_px is not None and (w, h) != (rec.width, rec.height):
+                live_px = live_px * np.array([rec.width / w, rec.height / h], np.float32)
+            rec.record(time.time(), live_px, self.live_vis, idx, frame_acc)
+
+    @staticmethod
+    def _close_recorder(rec):
+        # detached from self.recorder under the lock first, so nothing writes to it any more
+        if rec is not None:
+            rec.close()
+            if rec.error is not None:
+                log("recording failed", rec.path, repr(rec.error), "dropped chunks:", rec.dropped_chunks)
+            elif rec.dropped_chunks:
+                log("recorded", rec.path, "dropped chunks:", rec.dropped_chunks)
+            else:
+                log("recorded", rec.path)
+
+    def _timeline_tick(self, now: float):
+        """Reference side of one timeline tick: (t_ref, cursor, interpolated frame)."""
+        elapsed = now - self.start_time if self.start_time else 0.0
+        t_ref = elapsed * (self.playback_speed if self._play else 0.0)
+        cursor = self.ref_cursor(t_ref)
+        if len(self.ref_seq) == 0:  # reference without frames: nothing to follow
+            return t_ref, cursor, np.full((33, 2), np.nan, np.float32)
+        return t_ref, cursor, lerp_frames(self.ref_seq, *cursor)
+
+    def ref_cursor(self, t: float):
+        """(i, j, w): reference time t (looped) falls between frames i and j at fraction w."""
+        n = len(self.ref_t)
+        if n < 2 or self.ref_duration <= 0: return 0, 0, 0.0
+        tt = t % self.ref_duration
+        i = int(np.searchsorted(self.ref_t, tt, side="right")) - 1
+        i = min(max(i, 0), n - 1)
+        if i == n - 1:
+            j, t_j = 0, self.ref_duration  # wrap: last frame blends into the first
+        else:
+            j, t_j = i + 1, self.ref_t[i + 1]
+        span = t_j - self.ref_t[i]
+        w = float(np.clip((tt - self.ref_t[i]) / span, 0.0, 1.0)) if span > 1e-9 else 0.0
+        return i, j, w
+
+    # ---- calibration ----
+    def start_calibration(self):
+        self._calib_state = "collecting"
+        self._calib_samples = []
+        self._calib_since = None
+
+    def clear_calibration(self):
+        """Drop the retarget (back to plain per-frame alignment)."""
+        self._ref_fit = None  # first: the stream checks it before using the rest
+        self._ref_fit_wh = None
+        self._calib_size = np.nan
+        self._track_s = 1.0
+        self._calib_state = "idle"
+        self._calib_samples = []
+        self._calib_since = None
+        self._calib_player = None
+
+    def _bind_calibration(self):
+        # a calibration belongs to the first player who starts a session with it
+        # (players usually calibrate before /control names them); a session for
+        # anyone else must not be scored against that body's limb ratios
+        if self._calib_state != "done": return
+        if self._calib_player is None:
+            self._calib_player = self.player
+        elif self._calib_player != self.player:
+            log("calibration cleared: player changed")
+            self.clear_calibration()
+
+    def calibration_status(self):
+        held = 0.0 if self._calib_since is None else time.time() - self._calib_since
+        return {"state": self._calib_state, "held": round(held, 2), "need": CALIB_HOLD_SEC}
+
+    def _calibration_step(self, live_px: np.ndarray, w: int, h: int):
+        if not retarget.is_t_pose(live_px):
+            self._calib_since = None
+            self._calib_samples = []
+            return
+        now = time.time()
+        if self._calib_since is None: self._calib_since = now
+        self._calib_samples.append(live_px.copy())
+        if now - self._calib_since < CALIB_HOLD_SEC: return
+
+        player = np.nanmedian(np.stack(self._calib_samples), axis=0)
+        ref_px_seq = self.ref_seq * np.array([w, h], np.float32)
+        ratios = retarget.limb_ratios(player, ref_px_seq)
+        self._ref_fit = retarget.retarget_sequence(ref_px_seq, ratios)
+        self._ref_fit_wh = (w, h)
+        self._calib_size = retarget.body_size(player)
+        self._track_s = 1.0
+        self._calib_state = "done"
+        self._calib_samples = []
+        self._calib_player = self.player if self._play else None
+        log("calibrated:", {k: round(v, 3) for k, v in ratios.items()})
+
+    def _track_calibrated(self, cursor, live_px: np.ndarray):
+        """Cheap per-frame update: pelvis translation + distance-to-camera scale."""
+        fit_seq = self._ref_fit  # may be cleared by a control thread meanwhile
+        if fit_seq is None: return None
+        fit = lerp_frames(fit_seq, *cursor)
+        root_l, root_r = retarget.pelvis(live_px), retarget.pelvis(fit)
+        if not (np.isfinite(root_l).all() and np.isfinite(root_r).all()): return None
+        size = retarget.body_size(live_px)
+        if np.isfinite(size) and self._calib_size > 1e-4:
+            a = TRACK_SCALE_ALPHA
+            self._track_s = (1 - a) * self._track_s + a * (size / self._calib_size)
+        return (fit - root_r) * self._track_s + root_l
+
+    def _update_live_ema(self, live_px_raw: np.ndarray, vis: np.ndarray):
+        """Visibility-weighted EMA of the live landmarks."""
+        if self.live_ema is None:
+            self.live_ema = centroid_fill(live_px_raw)
+        else:
+            a = np.where(vis >= MIN_VIS, LM_EMA_ALPHA_POS,
+                         LM_EMA_ALPHA_MISS_DECAY * LM_EMA_ALPHA_POS).reshape(-1, 1)
+            live_safe = np.where(np.isfinite(live_px_raw), live_px_raw, self.live_ema)
+            self.live_ema = (1 - a) * self.live_ema + a * live_safe
+        self.live_vis = vis
+
+    def _pool_step(self, pool, frame, rgb, w, h) -> bool:
+        """
+        Pipelined inference through the process pool: submit this frame, apply every
+        result that came back (in order). When nothing new arrived, the last landmarks
+        stay as they are, or are predicted forward with PREDICT_LANDMARKS.
+        """
+        if not PREDICT_LANDMARKS or self.predictor.should_infer(frame):
+            seq = pool.submit(self.station, rgb)
+            # results come back up to POSE_PIPELINE_DEPTH frames later: keep the motion
+            # probe of the frame each one belongs to
+            if PREDICT_LANDMARKS and seq is not None:
+                self._pool_probes[seq] = self.predictor.make_probe(frame)
+        got = pool.poll(self.station, block=pool.outstanding(self.station) > POSE_PIPELINE_DEPTH)
+        if not got:
+            if not PREDICT_LANDMARKS or not self._pool_found:
+                return self._pool_found and self.live_ema is not None
+            if self.live_ema is None or self.predictor.vel is None: return False
+            self.live_ema = self.predictor.predict(self.live_ema)
+            return True
+        for seq, arr in got:
+            probe = self._pool_probes.pop(seq, None)
+            if arr is None:
+                self.predictor.reset()
+                self._pool_found = False
+                continue
+            prev = self.live_ema
+            self._update_live_ema(*lm_array_to_px(arr, w, h, MIN_VIS))
+            self.predictor.observe(frame, prev, self.live_ema, probe)
+            self._pool_found = True
+        return self._pool_found
 
     def _ema_sRt(self, s, R, t):
         if len(self.s_hist) == 0:
@@ -419,21 +790,77 @@ class DanceComparison:
             out[:, 0] = cx + (out[:, 0] - cx) * self._xscale_ema
         return out
 
+    def _score_step(self, w: int, h: int, has_pose: bool, tick=None):
+        """
+        Everything after landmark estimation for one frame: alignment, scoring, telemetry
+        and recording against the timeline tick (the current one if None). Uses
+        self.live_ema when has_pose. Returns (aligned reference px or None, frame accuracy or None).
+        """
+        tick = tick or self.timeline.latest()
+        self._frame_wh = (w, h)
+        cursor = tick.cursor
+        idx = cursor_index(cursor)
+        if not has_pose:
+            if self._play and RECORD_SESSIONS: self._record(w, h, idx, None, 0.0)
+            return None, None
+
+        if self._calib_state == "collecting":
+            self._calibration_step(self.live_ema, w, h)
+
+        ref_aligned = None
+        if self._ref_fit is not None and self._ref_fit_wh == (w, h):
+            ref_aligned = self._track_calibrated(cursor, self.live_ema)
+        if ref_aligned is None:
+            ref_px = tick.ref_frame * np.array([[w, h]], np.float32)
+            ref_aligned = self._align_ref_to_live_blended(ref_px, self.live_ema)
+
+        # --- scoring ---
+        live_ang = compute_angles(self.live_ema)
+        ref_ang = compute_angles(ref_aligned)
+        frame_acc = score_from_angles(live_ang, ref_ang)  # 0..100
+        # EMA for on-screen stability + accumulate score
+        self._accuracy = 0.85 * self._accuracy + 0.15 * frame_acc
+        self._score += (frame_acc / 10.0) * (1.0 if self._play else 0.0)
+        if self._play:
+            # session mean over every scored frame (the ring buffer only keeps the newest)
+            self._frames += 1
+            self._acc_sum += frame_acc
+            self.telemetry.record(time.time(), frame_acc, idx, angle_errors(live_ang, ref_ang))
+            if RECORD_SESSIONS: self._record(w, h, idx, self.live_ema, frame_acc)
+        return ref_aligned, frame_acc
+
+    def ingest_packet(self, packet: bytes) -> bytes:
+        """Score one client-side pose packet (see remote_pose) and return the binary reply."""
+        seq, w, h, pts, vis = remote_pose.decode_landmarks(packet)
+        has_pose = pts is not None
+        if has_pose:
+            live_px_raw = pts * np.array([[w, h]], np.float32)
+            live_px_raw[vis < MIN_VIS] = np.nan
+            self._update_live_ema(live_px_raw, vis)
+        ref_aligned, frame_acc = self._score_step(w, h, has_pose)
+        ghost = None if ref_aligned is None else ref_aligned / np.array([[w, h]], np.float32)
+        return remote_pose.encode_result(seq, frame_acc or 0.0, self._accuracy, self._score, ghost)
+
     def stream_live(self):
         cap = _open_cam()
-        with mp_pose.Pose(model_complexity=POSE_COMPLEXITY,
-                          smooth_landmarks=SMOOTH_LANDMARKS,
-                          enable_segmentation=False,
-                          min_detection_confidence=0.5,
-                          min_tracking_confidence=0.5) as pose:
-
-            self.start_time = time.time()
-            frame_interval = 1.0 / TARGET_FPS
-            last = 0.0
+        pool = get_pose_pool()
+        # with the pool, inference happens in its workers: no in-process model
+        model = contextlib.nullcontext() if pool is not None else mp_pose.Pose(
+            model_complexity=POSE_COMPLEXITY,
+            smooth_landmarks=SMOOTH_LANDMARKS,
+            enable_segmentation=False,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5)
+        with model as pose:
+
             stream = cv2.cuda.Stream() if CUDA_OK else None
             fail_count = 0
+            seq = 0
+            tick_seq = 0
 
             while True:
+                # paced by the shared timeline, not by a sleep of our own
+                tick_seq = self.timeline.wait(tick_seq).seq
                 ok, frame = cap.read()
                 if not ok:
                     fail_count += 1
@@ -452,11 +879,7 @@ class DanceComparison:
                     time.sleep(0.02);
                     continue
                 fail_count = 0
-
-                now = time.time()
-                if now - last < frame_interval:
-                    time.sleep(max(0, frame_interval - (now - last)))
-                last = time.time()
+                t_capture = time.time()
 
                 if CUDA_OK:
                     g = cv2.cuda_GpuMat();
@@ -472,85 +895,133 @@ class DanceComparison:
 
                 h, w, _ = frame.shape
 
-                elapsed = time.time() - self.start_time
-                speed = self.playback_speed if self._play else 0.0
-                idx = int(elapsed * speed * self.ref_fps) % len(self.ref_norm)
-                ref = self.ref_norm[idx]
-                ref_px = ref * np.array([[w, h]], np.float32)
-
-                rgb.flags.writeable = False
-                res = pose.process(rgb)
-                rgb.flags.writeable = True
-
-                if res.pose_landmarks:
-                    live_px_raw, vis = lm_to_px(res.pose_landmarks.landmark, w, h, MIN_VIS)
-                    if self.live_ema is None:
-                        self.live_ema = centroid_fill(live_px_raw)
+                if pool is not None:
+                    has_pose = self._pool_step(pool, frame, rgb, w, h)
+                elif not PREDICT_LANDMARKS or self.predictor.should_infer(frame):
+                    rgb.flags.writeable = False
+                    res = pose.process(rgb)
+                    rgb.flags.writeable = True
+                    has_pose = bool(res.pose_landmarks)
+                    if has_pose:
+                        prev = self.live_ema
+                        live_px_raw, vis = lm_to_px(res.pose_landmarks.landmark, w, h, MIN_VIS)
+                        self._update_live_ema(live_px_raw, vis)
+                        self.predictor.observe(frame, prev, self.live_ema)
                     else:
-                        a = np.where(vis >= MIN_VIS, LM_EMA_ALPHA_POS,
-                                     LM_EMA_ALPHA_MISS_DECAY * LM_EMA_ALPHA_POS).reshape(-1, 1)
-                        live_safe = np.where(np.isfinite(live_px_raw), live_px_raw, self.live_ema)
-                        self.live_ema = (1 - a) * self.live_ema + a * live_safe
-
-                    ref_aligned = self._align_ref_to_live_blended(ref_px, self.live_ema)
+                        self.predictor.reset()
+                else:
+                    self.live_ema = self.predictor.predict(self.live_ema)
+                    has_pose = True
 
-                    # draw
+                ref_aligned, _ = self._score_step(w, h, has_pose, self.timeline.latest())
+                t_infer = time.time()
+                if ref_aligned is not None:
                     draw_fast_skeleton(frame, self.live_ema, COLOR_LIVE, COLOR_JOINT)
                     draw_ghost(frame, ref_aligned, COLOR_COACH, COLOR_JOINT, alpha=COACH_ALPHA)
-
-                    # --- scoring ---
-                    live_ang = compute_angles(self.live_ema)
-                    ref_ang = compute_angles(ref_aligned)
-                    frame_acc = score_from_angles(live_ang, ref_ang)  # 0..100
-                    # EMA for on-screen stability + accumulate score
-                    self._accuracy = 0.85 * self._accuracy + 0.15 * frame_acc
-                    self._score += (frame_acc / 10.0) * (1.0 if self._play else 0.0)
-                    self._frames += 1
-                else:
+                if not has_pose:
                     cv2.putText(frame, "Step into view", (24, 48),
                                 cv2.FONT_HERSHEY_SIMPLEX, 1.2, (230, 230, 230), 2, cv2.LINE_AA)
+                elif self._calib_state == "collecting":
+                    cv2.putText(frame, "Hold a T-pose", (24, 48),
+                                cv2.FONT_HERSHEY_SIMPLEX, 1.2, (230, 230, 230), 2, cv2.LINE_AA)
 
                 ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
                 if not ok: continue
-                yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n")
+                yield mjpeg_part(buf.tobytes(), seq, t_capture, t_infer, time.time())
+                seq += 1
 
         cap.release()
 
-    def stream_ref(self, width=COACH_W, height=COACH_H):
-        self.start_time = time.time()
-        frame_interval = 1.0 / TARGET_FPS
-        last = 0.0
-        target_h_px = COACH_PANEL_TARGET_HEIGHT_FRAC * height
-        pixels_per_unit = target_h_px / max(self.ref_base_h_norm, 1e-4)
-
-        while True:
-            now = time.time()
-            if now - last < frame_interval:
-                time.sleep(max(0, frame_interval - (now - last)))
-            last = time.time()
-
+    # ------------------ replay ------------------
+    def rescore(self, reader: SessionReader) -> dict:
+        """Score a recorded session again against this comparator's reference."""
+        W, H = reader.meta["width"], reader.meta["height"]
+        wh = np.array([[W, H]], np.float32)
+        score = acc_sum = rec_sum = 0.0
+        frames = scored = 0
+        for i in range(len(reader)):
+            fr = reader.frame(i)
+            frames += 1
+            rec_sum += fr["accuracy"]
+            live = fr["landmarks"]
+            if not np.isfinite(live).any(): continue
+            ref_px = self.ref_norm[fr["ref_index"] % len(self.ref_norm)] * wh
+            ref_aligned = self._align_ref_to_live_blended(ref_px, live)
+            frame_acc = score_from_angles(compute_angles(live), compute_angles(ref_aligned))
+            score += frame_acc / 10.0
+            acc_sum += frame_acc
+            scored += 1
+        return {"frames": frames, "scored_frames": scored, "score": score,
+                "accuracy_mean": acc_sum / scored if scored else 0.0,
+                "recorded_accuracy_mean": rec_sum / frames if frames else 0.0}
+
+    def stream_replay(self, reader: SessionReader, speed: float = 1.0, start_sec: float = 0.0):
+        """Render a recorded session (live skeleton + aligned ghost) as MJPEG at `speed` x."""
+        try:
+            W, H = reader.meta["width"], reader.meta["height"]
+            k = min(1.0, REPLAY_MAX_W / W)
+            w, h = int(W * k), int(H * k)
+            wh = np.array([[w, h]], np.float32)
+            for fr in reader.replay(speed, start_sec):
+                canvas = np.zeros((h, w, 3), np.uint8)
+                canvas[:] = (18, 18, 24)
+                live = fr["landmarks"] * k
+                if np.isfinite(live).any():
+                    ref_px = self.ref_norm[fr["ref_index"] % len(self.ref_norm)] * wh
+                    draw_fast_skeleton(canvas, live, COLOR_LIVE, COLOR_JOINT)
+                    draw_ghost(canvas, self._align_ref_to_live_blended(ref_px, live), COLOR_COACH, COLOR_JOINT)
+                cv2.putText(canvas, f"{fr['t']:6.2f}s  acc {fr['accuracy']:5.1f}", (16, 32),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (230, 230, 230), 2, cv2.LINE_AA)
+                ok, buf = cv2.imencode(".jpg", canvas, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+                if not ok: continue
+                yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n")
+        finally:
+            # runs when the stream ends or the client disconnects (generator closed)
+            reader.close()
+
+    def _coach_frame(self, tick, width, height):
+        """Coach panel JPEG for a tick: drawn and encoded once, shared by every viewer."""
+        with self._coach_lock:
+            hit = self._coach_cache.get((width, height))
+            if hit is not None and hit[0] == tick.seq: return hit[1]
+
+            target_h_px = COACH_PANEL_TARGET_HEIGHT_FRAC * height
+            pixels_per_unit = target_h_px / max(self.ref_base_h_norm, 1e-4)
             panel = np.zeros((height, width, 3), np.uint8)
             panel[:] = (18, 18, 24)
 
-            elapsed = time.time() - self.start_time
-            speed = self.playback_speed if self._play else 0.0
-            idx = int(elapsed * speed * self.ref_fps) % len(self.ref_norm)
-            ref = self.ref_norm[idx]
-
-            pts = ref.copy()
+            pts = tick.ref_frame.copy()
             pts[:, 0] = (pts[:, 0] - 0.5) * pixels_per_unit + width * 0.5
             pts[:, 1] = (pts[:, 1] - 0.5) * pixels_per_unit + height * 0.5
 
             draw_fast_skeleton(panel, pts, COLOR_COACH, COLOR_JOINT)
-
+            t_drawn = time.time()
             ok, buf = cv2.imencode(".jpg", panel, [int(cv2.IMWRITE_JPEG_QUALITY), 76])
-            if not ok: continue
-            yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n")
+            out = (buf.tobytes(), t_drawn, time.time()) if ok else None
+            self._coach_cache[(width, height)] = (tick.seq, out)
+            return out
+
+    def stream_ref(self, width=COACH_W, height=COACH_H):
+        seq = 0
+        tick_seq = 0
+        while True:
+            tick = self.timeline.wait(tick_seq)
+            tick_seq = tick.seq
+            frame = self._coach_frame(tick, width, height)
+            if frame is None: continue
+            jpeg, t_drawn, t_encoded = frame
+            yield mjpeg_part(jpeg, seq, tick.wall, t_drawn, t_encoded)
+            seq += 1
 
 
 # -------- endpoints --------
+score_store = ScoreStore(SCORES_DB)
 comparator = DanceComparison("reference_dance.json", playback_speed=0.5)
 
+# station id -> comparator; 0 is the local camera, remote players get their own
+stations = {0: comparator}
+_next_station = iter(range(1, 1 << 31))
+
 
 @app.get("/video_live")
 def video_live():
@@ -564,25 +1035,241 @@ def video_ref():
                              media_type="multipart/x-mixed-replace; boundary=frame")
 
 
+def finish_session(comp: DanceComparison):
+    """Stop comp's session and wait (bounded) for it to be committed; the session or None."""
+    session = comp.set_play(False)
+    if session is not None:
+        session["committed"] = score_store.flush(SCORES_FLUSH_SEC)
+    return session
+
+
 @app.get("/control")
-def control(play: int = 0):
-    comparator.set_play(bool(play))
-    return JSONResponse({"ok": True, "play": bool(play)})
+def control(play: int = 0, player: str | None = None, name: str | None = None, dance: str | None = None):
+    """
+    play=1 starts a session for `player` (an opaque account id; `name` is shown on
+    leaderboards). play=0 stops it and returns the finished session once it is
+    committed, so score queries made after this response already include it
+    ("committed": false if the store did not get there within SCORES_FLUSH_SEC).
+    """
+    if player: comparator.player = player[:128]
+    if name: comparator.player_name = name[:64]
+    if dance: comparator.dance = dance[:128]
+    session = comparator.set_play(True) if play else finish_session(comparator)
+    return JSONResponse({"ok": True, "play": bool(play), "session": session})
+
+
+@app.get("/calibrate")
+def calibrate():
+    comparator.start_calibration()
+    return JSONResponse({"ok": True, **comparator.calibration_status()})
+
+
+@app.get("/calibration")
+def calibration():
+    return JSONResponse(comparator.calibration_status())
+
+
+_metrics_last = [None]
+
+
+def _metrics_sample(seq):
+    acc = round(float(comparator._accuracy) / METRICS_ACC_STEP) * METRICS_ACC_STEP
+    score = round(float(comparator._score))
+    if _metrics_last[0] == (acc, score):
+        return None
+    _metrics_last[0] = (acc, score)
+    return "data: " + json.dumps({"seq": seq, "ts": time.time() * 1000.0, "accuracy": acc, "score": score}) + "\n\n"
+
+
+# one sampling loop and one serialized payload per change, shared by every client
+metrics_feed = Broadcast(METRICS_MAX_HZ, _metrics_sample)
 
 
 @app.get("/metrics")
 def metrics():
     def gen():
-        while True:
-            time.sleep(1 / 30)
-            yield "data: " + json.dumps({
-                "accuracy": float(comparator._accuracy),
-                "score": float(comparator._score),
-            }) + "\n\n"
+        for payload in metrics_feed.events(METRICS_HEARTBEAT_SEC):
+            yield payload if payload is not None else ": keepalive\n\n"
 
     return StreamingResponse(gen(), media_type="text/event-stream")
 
 
+@app.get("/telemetry")
+def telemetry(points: int = 600, station: int = 0):
+    comp = stations.get(station)
+    if comp is None: raise HTTPException(404, "no such station")
+    data = comp.telemetry.series(max(1, min(points, 5000)))
+    data["joint_mean_error"] = comp.telemetry.joint_summary()
+    data["inference"] = comp.predictor.stats()
+    # /metrics only sends changes, so averaging its events weights them by how often
+    # accuracy moved; this is the per-frame mean
+    data["session"] = comp.session_stats()
+    return JSONResponse(data)
+
+
+@app.websocket("/ws/pose")
+async def ws_pose(ws: WebSocket):
+    """
+    Hybrid mode: the browser runs pose inference and streams binary landmark packets
+    (remote_pose); the server only aligns, scores and records. Text messages carry
+    control: {"play": true|false} and {"calibrate": true}, plus "player" / "name" /
+    "dance" like /control. Stopping answers {"session": ...} once it is committed.
+
+    Anything that touches files (loading the reference, opening and closing the
+    recorder) runs in the threadpool so it never stalls the event loop.
+    """
+    await ws.accept()
+    station = next(_next_station)
+    session = await run_in_threadpool(DanceComparison, comparator.reference_path,
+                                      comparator.playback_speed, station=station)
+    stations[station] = session
+    await ws.send_text(json.dumps({"station": station}))
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            if msg.get("bytes") is not None:
+                try:
+                    reply = await run_in_threadpool(session.ingest_packet, msg["bytes"])
+                except ValueError as e:
+                    await ws.send_text(json.dumps({"error": str(e)}))
+                    continue
+                await ws.send_bytes(reply)
+            elif msg.get("text"):
+                try:
+                    ctl = json.loads(msg["text"])
+                except ValueError:
+                    ctl = None
+                if not isinstance(ctl, dict):
+                    await ws.send_text(json.dumps({"error": "control message must be a JSON object"}))
+                    continue
+                if ctl.get("player"): session.player = str(ctl["player"])[:128]
+                if ctl.get("name"): session.player_name = str(ctl["name"])[:64]
+                if ctl.get("dance"): session.dance = str(ctl["dance"])[:128]
+                if ctl.get("play"):
+                    await run_in_threadpool(session.set_play, True)
+                elif "play" in ctl:
+                    finished = await run_in_threadpool(finish_session, session)
+                    await ws.send_text(json.dumps({"session": finished}))
+                if ctl.get("calibrate"): session.start_calibration()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stations.pop(station, None)
+        await run_in_threadpool(session.set_play, False)
+
+
+@app.get("/scores/leaderboard")
+def scores_leaderboard(dance: str, limit: int = 10, day: str | None = None, per_player: int = 0):
+    """Top sessions of a dance; day=YYYY-MM-DD for a daily board, per_player=1 for best per player."""
+    t0 = time.perf_counter()
+    rows = score_store.leaderboard(dance, max(1, min(limit, 100)), day, bool(per_player))
+    return JSONResponse({"rows": rows, "query_ms": round((time.perf_counter() - t0) * 1000, 3)})
+
+
+@app.get("/scores/history")
+def scores_history(player: str, dance: str | None = None, limit: int = 50, before: float | None = None):
+    t0 = time.perf_counter()
+    rows = score_store.history(player, dance, max(1, min(limit, 500)), before)
+    return JSONResponse({"rows": rows, "query_ms": round((time.perf_counter() - t0) * 1000, 3)})
+
+
+latency_reports = LatencyReports()
+
+
+@app.get("/latency/clock")
+def latency_clock():
+    """Server wall clock in ms, for the client's offset estimate."""
+    return JSONResponse({"t": time.time() * 1000.0})
+
+
+@app.post("/latency")
+def latency_report(report: dict):
+    """Window summary from a client collector: {client, streams: {name: {...}}}."""
+    client = str(report.get("client", "anon"))[:64]
+    for stream, row in (report.get("streams") or {}).items():
+        if isinstance(row, dict): latency_reports.add(client, str(stream)[:32], row)
+    return JSONResponse({"ok": True})
+
+
+@app.get("/latency")
+def latency():
+    return JSONResponse(latency_reports.snapshot())
+
+
+def _open_recording(name: str) -> SessionReader:
+    path = os.path.join(RECORD_DIR, os.path.basename(name))
+    if not os.path.isfile(path): raise HTTPException(404, "no such recording")
+    return SessionReader(path)
+
+
+@app.get("/recordings")
+def recordings():
+    out = []
+    if os.path.isdir(RECORD_DIR):
+        for name in sorted(os.listdir(RECORD_DIR)):
+            if not name.endswith(".mdrec"): continue
+            try:
+                r = _open_recording(name)
+            except ValueError:
+                continue
+            out.append({"name": name, "bytes": os.path.getsize(r.path),
+                        "frames": len(r), "seconds": round(r.duration, 2)})
+            r.close()
+    return JSONResponse(out)
+
+
+@app.get("/replay")
+def replay(name: str, speed: float = 1.0, start: float = 0.0):
+    reader = _open_recording(name)
+    player = DanceComparison(reader.meta.get("reference", comparator.reference_path),
+                             reader.meta.get("playback_speed", 0.5))
+    return StreamingResponse(player.stream_replay(reader, speed, start),
+                             media_type="multipart/x-mixed-replace; boundary=frame")
+
+
+@app.get("/rescore")
+def rescore(name: str):
+    reader = _open_recording(name)
+    try:
+        judge = DanceComparison(reader.meta.get("reference", comparator.reference_path))
+        return JSONResponse({"name": os.path.basename(name), **judge.rescore(reader)})
+    finally:
+        reader.close()
+
+
+def _check_admin(token):
+    if not ADMIN_TOKEN: raise HTTPException(404, "admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not hmac.compare_digest((token or "").encode(), ADMIN_TOKEN.encode()): raise HTTPException(403, "bad admin token")
+
+
+@app.get("/admin/profile")
+def admin_profile(seconds: float = 10.0, hz: int = 100, allocs: int = 1,
+                  thread: str | None = None, top: int = 25, token: str | None = None):
+    """
+    Sample all thread stacks (and tracemalloc if allocs=1) for `seconds`, then switch
+    off. thread=stream_live narrows the flamegraph to the live loop. Blocks for the window.
+    """
+    _check_admin(token)
+    name = time.strftime("profile-%Y%m%d-%H%M%S") + ".collapsed"
+    try:
+        out = profiling.capture(os.path.join(PROFILE_DIR, name), seconds, hz, bool(allocs),
+                                thread, max(1, min(top, 200)))
+    except profiling.CaptureBusy as e:
+        raise HTTPException(409, str(e))
+    log(f"profile captured: {name} ({out['ticks']} ticks)")
+    return JSONResponse({"flamegraph": f"/admin/profile/{name}", **out})
+
+
+@app.get("/admin/profile/{name}")
+def admin_profile_file(name: str, token: str | None = None):
+    _check_admin(token)
+    path = os.path.join(PROFILE_DIR, os.path.basename(name))
+    if not os.path.isfile(path): raise HTTPException(404, "no such profile")
+    return FileResponse(path, media_type="text/plain", filename=os.path.basename(path))
+
+
 @app.get("/health/camera")
 def health_camera():
     for idx in PROBE_INDICES:
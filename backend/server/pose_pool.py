@@ -0,0 +1,178 @@
+# server/pose_pool.py
+# Pose inference in worker processes. Frames are handed over through a shared-memory
+# ring of fixed-size slots (only slot ids and shapes go through the queues, never pixel
+# data); workers return (33, 4) landmark arrays [x, y, z, visibility].
+#
+# Each station is pinned to one worker (the one with the fewest stations when it first
+# submits): MediaPipe Pose tracks and smooths across consecutive frames, so a station's
+# frames must all reach the same model instance, in order. One station therefore gets
+# at most one worker's throughput, pipelined against its own capture and rendering;
+# more workers serve more stations. Results are released per station strictly in
+# submission order.
+import heapq
+import itertools
+import multiprocessing as mp_proc
+import queue
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_STOP = None
+
+
+def _worker_main(shm_name, slot_bytes, tasks, results, pose_kwargs):
+    import mediapipe as mp  # imported in the child so the parent does not pay for it per worker
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    poses = {}  # station -> Pose, so tracking state never mixes cameras
+    try:
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                break
+            station, seq, slot, h, w = task
+            out = None
+            try:
+                rgb = np.ndarray((h, w, 3), np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+                pose = poses.get(station)
+                if pose is None:
+                    pose = poses[station] = mp.solutions.pose.Pose(**pose_kwargs)
+                res = pose.process(rgb)
+                if res.pose_landmarks:
+                    out = np.array([[lm.x, lm.y, lm.z, lm.visibility]
+                                    for lm in res.pose_landmarks.landmark], np.float32)
+            except Exception:
+                out = None
+            results.put((station, seq, slot, out))
+    finally:
+        for p in poses.values():
+            p.close()
+        shm.close()
+
+
+class PosePool:
+    def __init__(self, workers: int = 2, max_w: int = 1920, max_h: int = 1080,
+                 slots: int = 8, pose_kwargs: Optional[dict] = None):
+        self.slot_bytes = max_w * max_h * 3
+        self.slots = slots
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+        self._free = list(range(slots))
+        self._lock = threading.Lock()
+        self._slot_ready = threading.Condition(self._lock)
+
+        ctx = mp_proc.get_context("spawn")
+        self._results = ctx.Queue()
+        self._tasks = [ctx.Queue() for _ in range(workers)]
+        self._station_worker: Dict[object, int] = {}  # station -> its pinned worker
+        self._worker_stations = [0] * workers
+        self._procs = [
+            ctx.Process(target=_worker_main,
+                        args=(self._shm.name, self.slot_bytes, q, self._results, pose_kwargs or {}),
+                        daemon=True)
+            for q in self._tasks
+        ]
+        for p in self._procs:
+            p.start()
+
+        # per-station ordering
+        self._seq = {}  # station -> itertools.count
+        self._next = {}  # station -> next seq to release
+        self._pending = {}  # station -> heap of (seq, landmarks)
+        self._ready = {}  # station -> list of released results
+        self._outstanding = {}  # station -> submitted and not yet released
+        self._arrived = threading.Condition(threading.Lock())
+
+        self._closed = False
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    # ---- submit side ----
+    def submit(self, station, rgb: np.ndarray, block: bool = False) -> Optional[int]:
+        """Copy one RGB frame into a free slot and queue it. Returns its seq, or None if the ring is full."""
+        h, w, _ = rgb.shape
+        if h * w * 3 > self.slot_bytes:
+            raise ValueError(f"frame {w}x{h} exceeds the pool's slot size")
+        with self._slot_ready:
+            while not self._free:
+                if not block:
+                    return None
+                self._slot_ready.wait()
+            slot = self._free.pop()
+            worker = self._station_worker.get(station)
+            if worker is None:
+                worker = min(range(len(self._tasks)), key=self._worker_stations.__getitem__)
+                self._station_worker[station] = worker
+                self._worker_stations[worker] += 1
+
+        dst = np.ndarray((h, w, 3), np.uint8, buffer=self._shm.buf, offset=slot * self.slot_bytes)
+        np.copyto(dst, rgb)
+
+        with self._arrived:
+            counter = self._seq.setdefault(station, itertools.count())
+            self._next.setdefault(station, 0)
+            seq = next(counter)
+            self._outstanding[station] = self._outstanding.get(station, 0) + 1
+        self._tasks[worker].put((station, seq, slot, h, w))
+        return seq
+
+    def outstanding(self, station) -> int:
+        with self._arrived:
+            return self._outstanding.get(station, 0)
+
+    # ---- result side ----
+    def _collect(self):
+        while not self._closed:
+            try:
+                item = self._results.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            station, seq, slot, out = item
+            with self._slot_ready:
+                self._free.append(slot)
+                self._slot_ready.notify()
+            with self._arrived:
+                heap = self._pending.setdefault(station, [])
+                heapq.heappush(heap, (seq, out))
+                ready = self._ready.setdefault(station, [])
+                while heap and heap[0][0] == self._next[station]:
+                    s, lm = heapq.heappop(heap)
+                    ready.append((s, lm))
+                    self._next[station] += 1
+                self._arrived.notify_all()
+
+    def poll(self, station, block: bool = False, timeout: float = 1.0) -> List:
+        """In-order (seq, landmarks or None) results released since the last poll."""
+        with self._arrived:
+            if block and not self._ready.get(station):
+                self._arrived.wait_for(lambda: self._ready.get(station), timeout)
+            out = self._ready.get(station) or []
+            self._ready[station] = []
+            self._outstanding[station] = self._outstanding.get(station, 0) - len(out)
+            return out
+
+    def infer(self, station, rgb: np.ndarray, timeout: float = 1.0):
+        """Submit and wait for this frame's landmarks (drains older results first)."""
+        seq = self.submit(station, rgb, block=True)
+        latest = None
+        while True:
+            got = self.poll(station, block=True, timeout=timeout)
+            if not got:
+                return None
+            for s, lm in got:
+                latest = lm
+                if s == seq:
+                    return latest
+
+    def close(self):
+        self._closed = True
+        for q in self._tasks:
+            q.put(_STOP)
+        for p in self._procs:
+            p.join(timeout=2)
+            if p.is_alive():
+                p.terminate()
+        self._collector.join(timeout=1)
+        self._shm.close()
+        self._shm.unlink()
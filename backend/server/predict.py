@@ -0,0 +1,67 @@
+# server/predict.py
+# Predictive landmark tracking: run pose inference at a lower cadence and carry the
+# smoothed landmarks forward with a per-joint constant-velocity model in between.
+# A cheap frame-difference check forces inference as soon as the picture changes a lot.
+import cv2
+import numpy as np
+
+
+class LandmarkPredictor:
+    def __init__(self, infer_every=2, motion_thresh=10.0, max_gap=4,
+                 vel_alpha=0.5, probe_size=(64, 36)):
+        self.infer_every = max(1, int(infer_every))
+        self.motion_thresh = motion_thresh  # mean abs gray-level diff on the probe image
+        self.max_gap = max_gap  # never predict more frames than this in a row
+        self.vel_alpha = vel_alpha
+        self.probe_size = probe_size
+        self.inferred = 0
+        self.predicted = 0
+        self.reset()
+
+    def reset(self):
+        self.vel = None  # (33, 2) px per frame
+        self._probe = None  # downscaled gray frame at the last inference
+        self._since = 0  # frames since the last inference
+        self._anchor = None  # landmark EMA right after the last inference
+
+    def make_probe(self, frame_bgr):
+        """Motion probe of a frame; observe() takes one in place of the frame."""
+        small = cv2.resize(frame_bgr, self.probe_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def should_infer(self, frame_bgr) -> bool:
+        if self.vel is None or self._since + 1 >= self.infer_every or self._since >= self.max_gap:
+            return True
+        probe = self.make_probe(frame_bgr)
+        return float(np.abs(probe - self._probe).mean()) > self.motion_thresh
+
+    def observe(self, frame_bgr, prev_ema, new_ema, probe=None):
+        """
+        Called after a real inference updated the landmark EMA from prev_ema to new_ema.
+        frame_bgr is the frame that was inferred; when results arrive later than their
+        frame (pipelined inference), pass that frame's make_probe() as probe instead.
+        """
+        self.inferred += 1
+        self._probe = probe if probe is not None else self.make_probe(frame_bgr)
+        gap = max(1, self._since + 1)
+        self._since = 0
+        # prev_ema has already been moved along by predict(); measure from the EMA at
+        # the previous real inference over the frames between the two inferences
+        anchor, self._anchor = self._anchor, new_ema.copy()
+        if prev_ema is None or anchor is None:
+            self.vel = np.zeros_like(new_ema)
+            return
+        v = (new_ema - anchor) / gap
+        v = np.where(np.isfinite(v), v, 0.0)
+        self.vel = v if self.vel is None else (1 - self.vel_alpha) * self.vel + self.vel_alpha * v
+
+    def predict(self, ema):
+        """Advance the landmark EMA one frame along the per-joint velocity."""
+        self.predicted += 1
+        self._since += 1
+        return ema + self.vel
+
+    def stats(self):
+        total = self.inferred + self.predicted
+        return {"inferred": self.inferred, "predicted": self.predicted,
+                "inference_ratio": round(self.inferred / total, 3) if total else None}
@@ -0,0 +1,119 @@
+# server/profiling.py
+# On-demand capture for diagnosing a slow kiosk without restarting it.
+#
+# capture() samples the Python stacks of every thread at `hz` for a bounded window
+# and, optionally, traces allocations with tracemalloc over the same window. Both are
+# switched off again before it returns; nothing is installed while idle (no sampler
+# thread, no tracemalloc hooks), so there is zero overhead outside a capture.
+#
+# Stacks are written in the collapsed format ("thread;outer;...;inner count" per line)
+# that flamegraph.pl, speedscope and inferno read directly.
+import collections
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+MAX_SECONDS = 60.0
+MAX_HZ = 500
+
+_busy = threading.Lock()
+
+
+class CaptureBusy(RuntimeError):
+    pass
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample_stacks(seconds, hz, thread_filter, counts):
+    me = threading.get_ident()
+    names = {}
+    period = 1.0 / hz
+    n = 0
+    deadline = time.perf_counter() + seconds
+    next_t = time.perf_counter()
+    while next_t < deadline:
+        if len(names) != threading.active_count():
+            names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me: continue
+            tname = names.get(ident, str(ident))
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if thread_filter and not any(thread_filter in s for s in stack) and thread_filter not in tname:
+                continue
+            stack.append(tname)
+            counts[";".join(reversed(stack))] += 1
+        n += 1
+        next_t += period
+        wait = next_t - time.perf_counter()
+        if wait > 0: time.sleep(wait)
+    return n
+
+
+def _alloc_sites(before, after, top):
+    fmt = lambda st: f"{st.traceback[0].filename}:{st.traceback[0].lineno}"
+    return {
+        "top_size": [{"site": fmt(s), "kb": round(s.size / 1024, 1), "count": s.count}
+                     for s in after.statistics("lineno")[:top]],
+        "top_growth": [{"site": fmt(s), "kb_diff": round(s.size_diff / 1024, 1), "count_diff": s.count_diff}
+                       for s in after.compare_to(before, "lineno")[:top]],
+    }
+
+
+def capture(out_path, seconds=10.0, hz=100, allocations=True, thread_filter=None,
+            top=25, trace_frames=1):
+    """
+    Blocking capture; writes collapsed stacks to out_path and returns a summary dict.
+    thread_filter keeps only stacks whose thread name or any frame contains the string.
+    Raises CaptureBusy if another capture is running.
+    """
+    seconds = max(0.1, min(float(seconds), MAX_SECONDS))
+    hz = max(1, min(int(hz), MAX_HZ))
+    if not _busy.acquire(blocking=False):
+        raise CaptureBusy("a capture is already running")
+    # someone may already run tracemalloc (e.g. PYTHONTRACEMALLOC); leave it as we found it
+    own_trace = allocations and not tracemalloc.is_tracing()
+    try:
+        if own_trace:
+            tracemalloc.start(trace_frames)
+        before = tracemalloc.take_snapshot() if allocations else None
+        counts = collections.Counter()
+        t0 = time.perf_counter()
+        ticks = _sample_stacks(seconds, hz, thread_filter, counts)
+        elapsed = time.perf_counter() - t0
+        allocs = None
+        if allocations:
+            after = tracemalloc.take_snapshot()
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            allocs = _alloc_sites(before.filter_traces(ignore), after.filter_traces(ignore), top)
+            allocs["traced_kb"] = round(tracemalloc.get_traced_memory()[0] / 1024, 1)
+    finally:
+        if own_trace:
+            tracemalloc.stop()
+        _busy.release()
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        for stack, c in counts.most_common():
+            f.write(f"{stack} {c}\n")
+
+    total = sum(counts.values()) or 1
+    leaf = collections.Counter()
+    for stack, c in counts.items():
+        leaf[stack.rsplit(";", 1)[-1]] += c
+    return {
+        "seconds": round(elapsed, 3),
+        "hz": hz,
+        "ticks": ticks,
+        "achieved_hz": round(ticks / elapsed, 1) if elapsed > 0 else 0.0,
+        "stacks": len(counts),
+        "top_self": [{"frame": fr, "pct": round(100.0 * c / total, 1)} for fr, c in leaf.most_common(top)],
+        "allocations": allocs,
+    }
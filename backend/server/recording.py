@@ -0,0 +1,274 @@
+# server/recording.py
+# Compact session log: one record per scored frame (live landmarks, visibility,
+# reference index, accuracy) so sessions can be replayed and rescored later.
+#
+# File layout (little endian):
+#   header   MAGIC | u32 meta_len | meta json (width, height, fps, reference, ...)
+#   chunk*   u32 body_len | zlib(body)
+#   index    u32 n_chunks | n_chunks * (u64 offset, u32 first_frame, u32 n_frames, f64 t0)
+#   footer   u64 index_offset | INDEX_MAGIC
+#
+# A chunk body holds up to CHUNK_FRAMES frames as column arrays:
+#   f64 t0 | u32 n | u16[n] dt_ms | i32[n] ref_index | u16[n] accuracy*100
+#   | u8[n*33] visibility (0 = missing, 1..255 = vis) | i16[n*33*2] landmarks
+# Landmarks are normalized by the frame size, quantized to 1/QUANT and delta-encoded
+# along time within the chunk (the first frame is absolute), which zlib then squeezes
+# to a few KB per second. Without a footer (crash) the reader rebuilds the index by
+# scanning chunks.
+import bisect
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+MAGIC = b"MDREC01\n"
+INDEX_MAGIC = b"MDIDX01\n"
+CHUNK_FRAMES = 120
+QUANT = 8192.0  # 1/8192 of the frame: sub-pixel at 1080p, range covers -4..4 frames
+N_LM = 33
+
+
+def _encode_chunk(t, ref_idx, acc, vis, pts):
+    n = len(t)
+    t0 = float(t[0])
+    dt = np.clip(np.round((t - t0) * 1000.0), 0, 65535).astype("<u2")
+    missing = ~np.isfinite(pts).all(axis=-1)
+    v = np.where(missing, 0, np.clip(np.round(vis * 254.0), 0, 254) + 1).astype(np.uint8)
+    q = np.where(missing[..., None], 0.0, np.nan_to_num(pts) * QUANT)
+    q = np.clip(np.round(q), -32767, 32767).astype(np.int32)
+    # hold missing joints at their last value so they do not cost a delta
+    for i in range(1, n):
+        q[i][missing[i]] = q[i - 1][missing[i]]
+    d = q.copy()
+    d[1:] = q[1:] - q[:-1]
+    body = b"".join([
+        struct.pack("<dI", t0, n),
+        dt.tobytes(),
+        np.asarray(ref_idx, "<i4").tobytes(),
+        np.clip(np.round(np.asarray(acc) * 100.0), 0, 65535).astype("<u2").tobytes(),
+        v.tobytes(),
+        np.clip(d, -32768, 32767).astype("<i2").tobytes(),
+    ])
+    return zlib.compress(body, 6)
+
+
+def _decode_chunk(blob):
+    body = zlib.decompress(blob)
+    t0, n = struct.unpack_from("<dI", body, 0)
+    o = 12
+    dt = np.frombuffer(body, "<u2", n, o); o += 2 * n
+    ref_idx = np.frombuffer(body, "<i4", n, o); o += 4 * n
+    acc = np.frombuffer(body, "<u2", n, o).astype(np.float32) / 100.0; o += 2 * n
+    v = np.frombuffer(body, np.uint8, n * N_LM, o).reshape(n, N_LM); o += n * N_LM
+    d = np.frombuffer(body, "<i2", n * N_LM * 2, o).reshape(n, N_LM, 2).astype(np.int32)
+    pts = np.cumsum(d, axis=0).astype(np.float32) / QUANT
+    pts[v == 0] = np.nan
+    vis = np.where(v == 0, 0.0, (v.astype(np.float32) - 1.0) / 254.0)
+    t = t0 + dt.astype(np.float64) / 1000.0
+    return t, ref_idx, acc, vis, pts
+
+
+class SessionRecorder:
+    """
+    Append-only writer. record() only copies into preallocated chunk arrays; full
+    chunks are compressed and written by a background thread.
+
+    record() never blocks on the disk: when the writer falls behind (queue full)
+    or has failed (e.g. disk full; `error` holds the exception) chunks are dropped
+    and counted in `dropped_chunks`, the chunks already written stay readable.
+    """
+
+    def __init__(self, path, width, height, fps, meta=None):
+        self.path = path
+        self.width, self.height = width, height
+        self._scale = np.array([1.0 / width, 1.0 / height], np.float32)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(path, "wb")
+        head = json.dumps({"width": width, "height": height, "fps": fps,
+                           "created": time.time(), **(meta or {})}).encode()
+        self._f.write(MAGIC + struct.pack("<I", len(head)) + head)
+        self._index = []
+        self._frames = 0
+        self._new_chunk()
+        self._q = queue.Queue(maxsize=64)
+        self.error = None
+        self.dropped_chunks = 0
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _new_chunk(self):
+        self._t = np.zeros(CHUNK_FRAMES, np.float64)
+        self._ref = np.zeros(CHUNK_FRAMES, np.int32)
+        self._acc = np.zeros(CHUNK_FRAMES, np.float32)
+        self._vis = np.zeros((CHUNK_FRAMES, N_LM), np.float32)
+        self._pts = np.full((CHUNK_FRAMES, N_LM, 2), np.nan, np.float32)
+        self._n = 0
+
+    def record(self, t, live_px, vis, ref_index, accuracy):
+        """live_px: (33, 2) pixels or None when nobody is in view."""
+        i = self._n
+        self._t[i] = t
+        self._ref[i] = ref_index
+        self._acc[i] = accuracy
+        if live_px is not None:
+            self._pts[i] = live_px * self._scale
+            self._vis[i] = vis
+        self._n += 1
+        if self._n == CHUNK_FRAMES:
+            self._flush()
+
+    def _flush(self):
+        if self._n == 0: return
+        n = self._n
+        try:
+            if self.error is not None: raise queue.Full
+            self._q.put_nowait((self._frames, self._t[:n], self._ref[:n], self._acc[:n], self._vis[:n], self._pts[:n]))
+            self._frames += n  # a dropped chunk leaves no gap in the frame numbering
+        except queue.Full:
+            self.dropped_chunks += 1
+        self._new_chunk()
+
+    def _write_loop(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                return
+            if self.error is not None:
+                # keep draining so the queue never fills up behind a dead writer
+                self.dropped_chunks += 1
+                continue
+            first, t, ref, acc, vis, pts = item
+            try:
+                blob = _encode_chunk(t, ref, acc, vis, pts)
+                off = self._f.tell()
+                self._f.write(struct.pack("<I", len(blob)) + blob)
+                self._index.append((off, first, len(t), float(t[0])))
+            except Exception as e:
+                self.error = e
+                self.dropped_chunks += 1
+
+    def close(self):
+        self._flush()
+        self._q.put(None)  # the writer always drains, so this cannot block for long
+        self._writer.join()
+        try:
+            # after a failed write the tail may be torn; no footer then, the reader
+            # rebuilds the index by scanning and stops at the first bad chunk
+            if self.error is None:
+                idx_off = self._f.tell()
+                self._f.write(struct.pack("<I", len(self._index)))
+                for off, first, n, t0 in self._index:
+                    self._f.write(struct.pack("<QIId", off, first, n, t0))
+                self._f.write(struct.pack("<Q", idx_off) + INDEX_MAGIC)
+        except OSError as e:
+            self.error = e
+        finally:
+            try:
+                self._f.close()
+            except OSError as e:
+                self.error = self.error or e
+
+
+class SessionReader:
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "rb")
+        if self._f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a session recording")
+        (meta_len,) = struct.unpack("<I", self._f.read(4))
+        self.meta = json.loads(self._f.read(meta_len))
+        self._data_start = self._f.tell()
+        self.index = self._read_index() or self._scan_index()
+        self._first = [first for _, first, _, _ in self.index]
+        self._t0 = [t0 for _, _, _, t0 in self.index]
+        self._cache = (None, None)
+
+    def _read_index(self):
+        self._f.seek(0, os.SEEK_END)
+        size = self._f.tell()
+        tail = 8 + len(INDEX_MAGIC)
+        if size < self._data_start + tail: return None
+        self._f.seek(size - tail)
+        idx_off_raw = self._f.read(tail)
+        if idx_off_raw[8:] != INDEX_MAGIC: return None
+        (idx_off,) = struct.unpack("<Q", idx_off_raw[:8])
+        self._f.seek(idx_off)
+        (n,) = struct.unpack("<I", self._f.read(4))
+        return [struct.unpack("<QIId", self._f.read(24)) for _ in range(n)]
+
+    def _scan_index(self):
+        out, first = [], 0
+        self._f.seek(self._data_start)
+        while True:
+            off = self._f.tell()
+            raw = self._f.read(4)
+            if len(raw) < 4: break
+            (blen,) = struct.unpack("<I", raw)
+            blob = self._f.read(blen)
+            if len(blob) < blen: break
+            try:
+                t0, n = struct.unpack_from("<dI", zlib.decompress(blob), 0)
+            except zlib.error:
+                break
+            out.append((off, first, n, t0))
+            first += n
+        return out
+
+    def __len__(self):
+        if not self.index: return 0
+        _, first, n, _ = self.index[-1]
+        return first + n
+
+    @property
+    def duration(self):
+        if not self.index: return 0.0
+        t = self._chunk(len(self.index) - 1)[0]
+        return float(t[-1] - self._t0[0])
+
+    def _chunk(self, ci):
+        if self._cache[0] == ci: return self._cache[1]
+        off = self.index[ci][0]
+        self._f.seek(off)
+        (blen,) = struct.unpack("<I", self._f.read(4))
+        data = _decode_chunk(self._f.read(blen))
+        self._cache = (ci, data)
+        return data
+
+    def frame(self, i):
+        """Frame i as a dict; landmarks are returned in pixels of the recorded size."""
+        ci = bisect.bisect_right(self._first, i) - 1
+        t, ref_idx, acc, vis, pts = self._chunk(ci)
+        j = i - self._first[ci]
+        wh = np.array([self.meta["width"], self.meta["height"]], np.float32)
+        return {"t": float(t[j] - self._t0[0]), "ref_index": int(ref_idx[j]), "accuracy": float(acc[j]),
+                "visibility": vis[j], "landmarks": pts[j] * wh}
+
+    def index_at(self, seconds):
+        """First frame at or after `seconds` into the session."""
+        target = self._t0[0] + seconds if self._t0 else 0.0
+        ci = max(0, bisect.bisect_right(self._t0, target) - 1)
+        t = self._chunk(ci)[0] if self.index else []
+        return self._first[ci] + int(np.searchsorted(t, target)) if self.index else 0
+
+    def replay(self, speed=1.0, start_sec=0.0):
+        """Yield frames from start_sec on, paced at `speed` x real time (speed <= 0: as fast as possible)."""
+        n = len(self)
+        i = self.index_at(start_sec)
+        wall0 = time.time()
+        t_start = None
+        while i < n:
+            fr = self.frame(i)
+            if t_start is None: t_start = fr["t"]
+            if speed > 0:
+                wait = (fr["t"] - t_start) / speed - (time.time() - wall0)
+                if wait > 0: time.sleep(wait)
+            yield fr
+            i += 1
+
+    def close(self):
+        self._f.close()
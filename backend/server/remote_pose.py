@@ -0,0 +1,61 @@
+# server/remote_pose.py
+# Binary wire format for browser-side pose inference (WebSocket /ws/pose).
+# Mirrored in frontend/src/pose/remoteScoring.js; all fields little endian.
+#
+# client -> server, one message per video frame (20 + 33*5 = 185 bytes):
+#   u8 version | u8 flags (bit 0: pose present) | u16 reserved | u32 seq
+#   f64 client time (ms) | u16 video width | u16 video height
+#   i16[33*2] x, y normalized to the video frame, * QUANT
+#   u8[33]    visibility * 255
+#
+# server -> client (20 bytes, + 132 when a ghost is attached):
+#   u8 version | u8 flags (bit 0: ghost present) | u16 reserved | u32 seq
+#   f32 frame accuracy | f32 smoothed accuracy | f32 score
+#   i16[33*2] aligned reference ghost, normalized, * QUANT (-32768 = joint missing)
+import struct
+import numpy as np
+
+VERSION = 1
+QUANT = 8192.0
+N_LM = 33
+_IN_HEAD = struct.Struct("<BBHIdHH")
+_OUT_HEAD = struct.Struct("<BBHIfff")
+IN_SIZE = _IN_HEAD.size + N_LM * 2 * 2 + N_LM
+
+
+def decode_landmarks(packet: bytes):
+    """-> (seq, width, height, pts (33, 2) normalized or None, vis (33,) or None)"""
+    if len(packet) < _IN_HEAD.size:
+        raise ValueError("short pose packet")
+    version, flags, _, seq, _, w, h = _IN_HEAD.unpack_from(packet, 0)
+    if version != VERSION:
+        raise ValueError(f"unsupported pose packet version {version}")
+    if w == 0 or h == 0:
+        raise ValueError(f"bad video size {w}x{h} in pose packet")
+    if not flags & 1:
+        return seq, w, h, None, None
+    if len(packet) < IN_SIZE:
+        raise ValueError("short pose packet")
+    o = _IN_HEAD.size
+    pts = np.frombuffer(packet, "<i2", N_LM * 2, o).reshape(N_LM, 2).astype(np.float32) / QUANT
+    vis = np.frombuffer(packet, np.uint8, N_LM, o + N_LM * 4).astype(np.float32) / 255.0
+    return seq, w, h, pts, vis
+
+
+def encode_landmarks(seq, width, height, pts=None, vis=None, t_ms=0.0) -> bytes:
+    """Python-side encoder (tests, load generators); pts normalized (33, 2)."""
+    head = _IN_HEAD.pack(VERSION, 1 if pts is not None else 0, 0, seq & 0xFFFFFFFF, t_ms, width, height)
+    if pts is None:
+        return head
+    q = np.clip(np.round(np.nan_to_num(pts) * QUANT), -32768, 32767).astype("<i2")
+    v = np.clip(np.round(np.asarray(vis) * 255.0), 0, 255).astype(np.uint8)
+    return head + q.tobytes() + v.tobytes()
+
+
+def encode_result(seq, frame_acc, accuracy, score, ghost=None) -> bytes:
+    head = _OUT_HEAD.pack(VERSION, 1 if ghost is not None else 0, 0, seq & 0xFFFFFFFF,
+                          frame_acc, accuracy, score)
+    if ghost is None:
+        return head
+    q = np.clip(np.round(np.nan_to_num(ghost, nan=-4.0) * QUANT), -32768, 32767).astype("<i2")
+    return head + q.tobytes()
@@ -0,0 +1,139 @@
+# server/retarget.py
+# Per-user calibration: measure the player's limb lengths from a held T-pose and
+# retarget the whole reference sequence to those proportions in one pass.
+import numpy as np
+import mediapipe as mp
+
+PLM = mp.solutions.pose.PoseLandmark
+
+# two virtual joints appended after the 33 pose landmarks
+MID_HIP, MID_SHOULDER = 33, 34
+
+# (parent, child, ratio group) in topological order from the pelvis root.
+# Bones sharing a group are measured together (left/right averaged).
+BONES = [
+    (MID_HIP, PLM.LEFT_HIP.value, "hip"),
+    (MID_HIP, PLM.RIGHT_HIP.value, "hip"),
+    (MID_HIP, MID_SHOULDER, "torso"),
+    (MID_SHOULDER, PLM.LEFT_SHOULDER.value, "shoulder"),
+    (MID_SHOULDER, PLM.RIGHT_SHOULDER.value, "shoulder"),
+    (MID_SHOULDER, PLM.NOSE.value, "torso"),
+    (PLM.LEFT_SHOULDER.value, PLM.LEFT_ELBOW.value, "upper_arm"),
+    (PLM.RIGHT_SHOULDER.value, PLM.RIGHT_ELBOW.value, "upper_arm"),
+    (PLM.LEFT_ELBOW.value, PLM.LEFT_WRIST.value, "forearm"),
+    (PLM.RIGHT_ELBOW.value, PLM.RIGHT_WRIST.value, "forearm"),
+    (PLM.LEFT_HIP.value, PLM.LEFT_KNEE.value, "thigh"),
+    (PLM.RIGHT_HIP.value, PLM.RIGHT_KNEE.value, "thigh"),
+    (PLM.LEFT_KNEE.value, PLM.LEFT_ANKLE.value, "shin"),
+    (PLM.RIGHT_KNEE.value, PLM.RIGHT_ANKLE.value, "shin"),
+]
+_N_MEASURED = len(BONES)  # ratios come from the main bones only
+# face, hands and feet follow their parent with the torso / limb ratio
+BONES += [(PLM.NOSE.value, i, "torso") for i in range(1, 11)]
+BONES += [(PLM.LEFT_WRIST.value, i, "forearm") for i in (17, 19, 21)]
+BONES += [(PLM.RIGHT_WRIST.value, i, "forearm") for i in (18, 20, 22)]
+BONES += [(PLM.LEFT_ANKLE.value, i, "shin") for i in (29, 31)]
+BONES += [(PLM.RIGHT_ANKLE.value, i, "shin") for i in (30, 32)]
+
+GROUPS = sorted({g for _, _, g in BONES})
+RATIO_CLIP = (0.4, 2.5)
+# Reference lengths come from 2D projections of a moving dancer: turns and bends only
+# ever shorten a bone, so the median underestimates it. A high percentile tracks the
+# unforeshortened length without following single-frame detection spikes.
+REF_LENGTH_PCT = 90
+
+_PARENT = np.array([p for p, _, _ in BONES])
+_CHILD = np.array([c for _, c, _ in BONES])
+_GROUP_IDX = {g: np.array([i for i, (_, _, gg) in enumerate(BONES[:_N_MEASURED]) if gg == g])
+              for g in GROUPS}
+
+
+def extend(seq: np.ndarray) -> np.ndarray:
+    """(..., 33, 2) -> (..., 35, 2) with mid-hip and mid-shoulder appended."""
+    mh = 0.5 * (seq[..., PLM.LEFT_HIP.value, :] + seq[..., PLM.RIGHT_HIP.value, :])
+    ms = 0.5 * (seq[..., PLM.LEFT_SHOULDER.value, :] + seq[..., PLM.RIGHT_SHOULDER.value, :])
+    return np.concatenate([seq, mh[..., None, :], ms[..., None, :]], axis=-2)
+
+
+def bone_lengths(seq: np.ndarray) -> np.ndarray:
+    """Per-bone lengths for one pose (33, 2) or a sequence (N, 33, 2)."""
+    ext = extend(seq)
+    return np.linalg.norm(ext[..., _CHILD, :] - ext[..., _PARENT, :], axis=-1)
+
+
+def group_lengths(lengths: np.ndarray, pct: float = 50) -> dict:
+    """
+    Length per ratio group; lengths is (n_bones,) or (N, n_bones). Each bone takes
+    the pct-th percentile over frames, then the bones of a group are averaged.
+    """
+    lengths = np.atleast_2d(lengths)
+    out = {}
+    for g, ix in _GROUP_IDX.items():
+        v = lengths[:, ix]
+        seen = np.isfinite(v).any(axis=0)
+        out[g] = float(np.mean(np.nanpercentile(v[:, seen], pct, axis=0))) if seen.any() else np.nan
+    return out
+
+
+def is_t_pose(pts: np.ndarray, tol_deg: float = 25.0) -> bool:
+    """Both arms roughly straight and horizontal, wrists out past the shoulders."""
+    J = PLM
+    for s, e, w, o in ((J.LEFT_SHOULDER, J.LEFT_ELBOW, J.LEFT_WRIST, J.RIGHT_SHOULDER),
+                       (J.RIGHT_SHOULDER, J.RIGHT_ELBOW, J.RIGHT_WRIST, J.LEFT_SHOULDER)):
+        ps, pe, pw, po = pts[s.value], pts[e.value], pts[w.value], pts[o.value]
+        if not all(np.isfinite(p).all() for p in (ps, pe, pw, po)):
+            return False
+        # the wrist must lie on the far side of its own shoulder from the other one
+        # (a horizontal arm folded across the chest is not a T-pose)
+        outward = float(ps[0] - po[0])
+        if abs(outward) < 1e-6 or (pw[0] - ps[0]) * outward <= 0:
+            return False
+        v = pw - ps
+        n = float(np.linalg.norm(v))
+        if n < 1e-6: return False
+        if abs(float(np.degrees(np.arcsin(np.clip(v[1] / n, -1.0, 1.0))))) > tol_deg:
+            return False
+        straight = np.linalg.norm(pe - ps) + np.linalg.norm(pw - pe)
+        if n < 0.85 * straight: return False
+    return True
+
+
+def limb_ratios(player_pose: np.ndarray, ref_seq: np.ndarray) -> dict:
+    """Player / reference length per group, falling back to the torso ratio."""
+    live = group_lengths(bone_lengths(player_pose))  # held frontal T-pose: not foreshortened
+    ref = group_lengths(bone_lengths(ref_seq), REF_LENGTH_PCT)
+    base = live["torso"] / ref["torso"] if ref["torso"] > 1e-6 else np.nan
+    if not np.isfinite(base): base = 1.0
+    ratios = {}
+    for g in GROUPS:
+        r = live[g] / ref[g] if np.isfinite(live[g]) and ref[g] > 1e-6 else base
+        ratios[g] = float(np.clip(r, base * RATIO_CLIP[0], base * RATIO_CLIP[1]))
+    return ratios
+
+
+def retarget_sequence(ref_seq: np.ndarray, ratios: dict) -> np.ndarray:
+    """
+    Rebuild every reference frame from the pelvis outwards with bone vectors
+    scaled per group. Vectorized over frames: one array op per bone.
+    ref_seq is (N, 33, 2) in pixels; returns (N, 33, 2) with the pelvis kept.
+    A joint whose parent is missing comes out NaN, like any undetected landmark.
+    """
+    src = extend(ref_seq.astype(np.float32))
+    out = np.full_like(src, np.nan)
+    out[:, MID_HIP] = src[:, MID_HIP]
+    for p, c, g in BONES:
+        out[:, c] = out[:, p] + (src[:, c] - src[:, p]) * ratios[g]
+    return out[:, :33]
+
+
+def body_size(pts: np.ndarray) -> float:
+    """Torso length plus hip width: a cheap, rotation-tolerant size measure."""
+    ext = extend(pts)
+    torso = np.linalg.norm(ext[MID_SHOULDER] - ext[MID_HIP])
+    hips = np.linalg.norm(pts[PLM.LEFT_HIP.value] - pts[PLM.RIGHT_HIP.value])
+    v = float(torso + hips)
+    return v if np.isfinite(v) else np.nan
+
+
+def pelvis(pts: np.ndarray) -> np.ndarray:
+    return 0.5 * (pts[PLM.LEFT_HIP.value] + pts[PLM.RIGHT_HIP.value])
@@ -0,0 +1,285 @@
+# server/scores.py
+# Embedded score store: one row per finished session in SQLite.
+#
+# `player` is an opaque account id (the auth subject), never an email; the name shown
+# on leaderboards lives in `players` and is joined in only for the rows returned.
+#
+# Writes never block the caller: submit() only enqueues, and a writer thread commits
+# everything that queued up while the previous commit ran in one transaction (group
+# commit: an idle store writes a lone row right away, a busy one batches up to
+# BATCH_MAX). Reads use their own connections (WAL mode, so they do not wait for it).
+#
+# A failing batch (locked database, disk full, bad row) is logged and counted in
+# `dropped`; the writer keeps running and flush() takes a timeout, so a request that
+# waits for a commit can never hang on it.
+#
+# Indexes match the queries:
+#   (dance, score DESC)        top-N sessions of a dance
+#   player_best (dance, score DESC)
+#                              best score per player: one row per (dance, player),
+#                              kept current by the writer in the same transaction
+#   (player, started DESC)     a player's history
+#   (day, dance, score DESC)   daily leaderboards (and daily best per player, which
+#                              only groups one day's sessions)
+#
+#   python -m backend.server.scores --bench 300000              # query latency at that size
+#   python -m backend.server.scores --bench 240000 --dances 1   # everything on one dance
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+BATCH_MAX = 256
+QUEUE_MAX = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    dance TEXT NOT NULL,
+    player TEXT NOT NULL,
+    station INTEGER NOT NULL DEFAULT 0,
+    started REAL NOT NULL,
+    ended REAL NOT NULL,
+    day TEXT NOT NULL,
+    score REAL NOT NULL,
+    accuracy REAL NOT NULL,
+    frames INTEGER NOT NULL,
+    recording TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_dance_score ON sessions (dance, score DESC);
+-- superseded by player_best
+DROP INDEX IF EXISTS sessions_dance_player_score;
+CREATE INDEX IF NOT EXISTS sessions_player_started ON sessions (player, started DESC);
+CREATE INDEX IF NOT EXISTS sessions_day_dance_score ON sessions (day, dance, score DESC);
+CREATE TABLE IF NOT EXISTS players (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS player_best (
+    dance TEXT NOT NULL,
+    player TEXT NOT NULL,
+    score REAL NOT NULL,
+    session_id INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    PRIMARY KEY (dance, player)
+);
+CREATE INDEX IF NOT EXISTS player_best_dance_score ON player_best (dance, score DESC);
+"""
+# stores created before player_best existed: fill it once from the sessions
+_BACKFILL_BEST = """
+INSERT INTO player_best (dance, player, score, session_id, sessions)
+SELECT dance, player, MAX(score), id, COUNT(*) FROM sessions GROUP BY dance, player
+"""
+_COLS = ("dance", "player", "station", "started", "ended", "day", "score", "accuracy", "frames", "recording")
+_INSERT = f"INSERT INTO sessions ({', '.join(_COLS)}) VALUES ({', '.join('?' * len(_COLS))})"
+_UPSERT_PLAYER = "INSERT INTO players (id, name) VALUES (?, ?) ON CONFLICT (id) DO UPDATE SET name = excluded.name"
+# SET expressions see the row before the update, so session_id is compared to the old best
+_UPSERT_BEST = """
+INSERT INTO player_best (dance, player, score, session_id, sessions) VALUES (?, ?, ?, ?, 1)
+ON CONFLICT (dance, player) DO UPDATE SET
+    sessions = sessions + 1,
+    session_id = CASE WHEN excluded.score > score THEN excluded.session_id ELSE session_id END,
+    score = MAX(score, excluded.score)
+"""
+
+
+def _log(*a): print("[scores]", *a, file=sys.stderr, flush=True)
+
+
+def _connect(path):
+    con = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+
+class ScoreStore:
+    def __init__(self, path="scores.db"):
+        self.path = path
+        con = _connect(path)
+        con.executescript(_SCHEMA)
+        with con:
+            if con.execute("SELECT 1 FROM player_best LIMIT 1").fetchone() is None:
+                con.execute(_BACKFILL_BEST)
+        con.close()
+        self._q = queue.Queue(maxsize=QUEUE_MAX)
+        self._local = threading.local()
+        self.dropped = 0
+        self.written = 0
+        # submitted / finished (committed or dropped) counts, for flush()
+        self._progress = threading.Condition()
+        self._submitted = 0
+        self._finished = 0
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    # ---- writes ----
+    def submit(self, dance, player, score, accuracy, frames, started, ended=None,
+               station=0, recording=None, player_name=None) -> bool:
+        """
+        Queue one finished session; False if the queue is full (row dropped).
+        player_name, when given, becomes the player's display name.
+        """
+        ended = time.time() if ended is None else ended
+        row = (dance, player, int(station), float(started), float(ended),
+               time.strftime("%Y-%m-%d", time.localtime(started)),
+               float(score), float(accuracy), int(frames), recording)
+        with self._progress:
+            try:
+                self._q.put_nowait((row, (player, player_name) if player_name else None))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._submitted += 1
+            return True
+
+    def _write_loop(self):
+        con = _connect(self.path)
+        while True:
+            batch = [self._q.get()]
+            stop = batch[0] is None
+            while not stop and len(batch) < BATCH_MAX:
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            items = [r for r in batch if r is not None]
+            try:
+                if items:
+                    self._commit(con, items)
+                    self.written += len(items)
+            except Exception as e:  # locked, disk full, a bad row: drop the batch, keep writing
+                self.dropped += len(items)
+                _log(f"dropped {len(items)} sessions: {type(e).__name__}: {e}")
+            finally:
+                for _ in batch:
+                    self._q.task_done()
+                with self._progress:
+                    self._finished += len(items)
+                    self._progress.notify_all()
+            if stop:
+                con.close()
+                return
+
+    @staticmethod
+    def _commit(con, items):
+        with con:
+            for row, _ in items:
+                sid = con.execute(_INSERT, row).lastrowid
+                con.execute(_UPSERT_BEST, (row[0], row[1], row[6], sid))
+            con.executemany(_UPSERT_PLAYER, [name for _, name in items if name])
+
+    def flush(self, timeout=None) -> bool:
+        """
+        Wait until everything submitted so far is committed (or dropped by a failed
+        batch). False if that took longer than timeout seconds.
+        """
+        with self._progress:
+            target = self._submitted
+            return self._progress.wait_for(lambda: self._finished >= target, timeout)
+
+    def close(self):
+        self._q.put(None)
+        self._writer.join()
+
+    # ---- reads ----
+    def _read(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = _connect(self.path)
+        return con
+
+    def leaderboard(self, dance, limit=10, day=None, per_player=False):
+        """Top sessions of a dance (optionally one day, or each player's best only)."""
+        if per_player and not day:
+            top = "SELECT player, score, sessions FROM player_best WHERE dance = ? ORDER BY score DESC LIMIT ?"
+        elif per_player:
+            top = ("SELECT player, MAX(score) AS score, COUNT(*) AS sessions FROM sessions "
+                   "WHERE dance = ? AND day = ? GROUP BY player ORDER BY score DESC LIMIT ?")
+        else:
+            top = ("SELECT id, player, score, accuracy, frames, started FROM sessions "
+                   "WHERE " + ("day = ? AND dance = ?" if day else "dance = ?") +
+                   " ORDER BY score DESC LIMIT ?")
+        # names are looked up for the top rows only, so the ranking stays index-only
+        sql = ("SELECT t.*, p.name FROM (" + top + ") t "
+               "LEFT JOIN players p ON p.id = t.player ORDER BY t.score DESC")
+        args = ((dance, day) if per_player else (day, dance)) if day else (dance,)
+        return [dict(r) for r in self._read().execute(sql, (*args, int(limit)))]
+
+    def history(self, player, dance=None, limit=50, before=None):
+        """A player's sessions, newest first; `before` (a started timestamp) pages back."""
+        sql = "SELECT id, dance, score, accuracy, frames, started, recording FROM sessions WHERE player = ?"
+        args = [player]
+        if before is not None:
+            sql += " AND started < ?"
+            args.append(float(before))
+        if dance:
+            sql += " AND dance = ?"
+            args.append(dance)
+        sql += " ORDER BY started DESC LIMIT ?"
+        args.append(int(limit))
+        return [dict(r) for r in self._read().execute(sql, args)]
+
+    def explain(self, sql, args=()):
+        return [r[-1] for r in self._read().execute("EXPLAIN QUERY PLAN " + sql, args)]
+
+
+def _bench(n, path, n_dances=40):
+    import os
+    import random
+    import statistics
+
+    if os.path.exists(path): os.remove(path)
+    store = ScoreStore(path)
+    rnd = random.Random(0)
+    dances = [f"dance-{i}" for i in range(n_dances)]
+    players = [f"player-{i}" for i in range(5000)]
+    t0 = time.time() - 365 * 86400
+    t = time.perf_counter()
+    submit_us = []
+    for i in range(n):
+        s = time.perf_counter()
+        started = t0 + i * (365 * 86400 / n)
+        while not store.submit(rnd.choice(dances), rnd.choice(players), rnd.uniform(0, 5000),
+                               rnd.uniform(0, 100), 1800, started, started + 60):
+            time.sleep(0.001)  # bench only: wait for the writer instead of dropping
+        submit_us.append((time.perf_counter() - s) * 1e6)
+    store.flush()
+    print(f"inserted {n} sessions in {time.perf_counter() - t:.1f}s "
+          f"(submit p50 {statistics.median(submit_us):.1f} us)")
+
+    day = time.strftime("%Y-%m-%d", time.localtime(t0 + 200 * 86400))
+    queries = {
+        "leaderboard top10": lambda: store.leaderboard(rnd.choice(dances), 10),
+        "leaderboard top10 per player": lambda: store.leaderboard(rnd.choice(dances), 10, per_player=True),
+        "leaderboard top10 one day": lambda: store.leaderboard(rnd.choice(dances), 10, day=day),
+        "history 50": lambda: store.history(rnd.choice(players), limit=50),
+        "history 50 one dance": lambda: store.history(rnd.choice(players), rnd.choice(dances), 50),
+    }
+    for name, q in queries.items():
+        ms = []
+        for _ in range(200):
+            s = time.perf_counter()
+            q()
+            ms.append((time.perf_counter() - s) * 1000)
+        ms.sort()
+        print(f"{name:<30} p50 {ms[100]:7.3f} ms  p99 {ms[197]:7.3f} ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Score store query benchmark.")
+    ap.add_argument("--bench", type=int, default=300000, help="sessions to insert")
+    ap.add_argument("--dances", type=int, default=40,
+                    help="dances the sessions are spread over (1 = one very popular dance)")
+    ap.add_argument("--db", default="/tmp/scores-bench.db")
+    args = ap.parse_args()
+    _bench(args.bench, args.db, args.dances)
@@ -0,0 +1,76 @@
+# server/telemetry.py
+# Fixed-size per-session history: accuracy, per-joint angle error and reference index
+# per scored frame, kept in preallocated NumPy ring buffers (no per-frame allocation).
+import threading
+from typing import List
+import numpy as np
+
+
+class SessionTelemetry:
+    def __init__(self, joint_names: List[str], capacity: int = 36000):
+        self.joint_names = list(joint_names)
+        self.capacity = int(capacity)
+        self.t = np.zeros(self.capacity, np.float64)
+        self.accuracy = np.zeros(self.capacity, np.float32)
+        self.ref_index = np.zeros(self.capacity, np.int32)
+        self.joint_err = np.full((self.capacity, len(self.joint_names)), np.nan, np.float32)
+        self.count = 0  # total frames ever recorded; monotonically increasing
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def record(self, t: float, accuracy: float, ref_index: int, joint_err):
+        with self._lock:
+            i = self.count % self.capacity
+            self.t[i] = t
+            self.accuracy[i] = accuracy
+            self.ref_index[i] = ref_index
+            self.joint_err[i] = joint_err
+            self.count += 1
+
+    def _sample_slots(self, max_points: int) -> np.ndarray:
+        """Ring slots of evenly spaced samples over the retained history, oldest first."""
+        n = len(self)
+        if n == 0: return np.zeros(0, np.int64)
+        logical = np.unique(np.linspace(0, n - 1, min(n, max(1, max_points))).astype(np.int64))
+        first = self.count - n
+        return (first + logical) % self.capacity
+
+    def series(self, max_points: int = 600) -> dict:
+        """
+        Downsampled time series for the results page. Only the sampled slots are
+        gathered; the full history is never copied.
+        """
+        with self._lock:
+            slots = self._sample_slots(max_points)
+            t0 = self.t[(self.count - len(self)) % self.capacity] if len(self) else 0.0
+            t = self.t[slots] - t0
+            acc = self.accuracy[slots]
+            idx = self.ref_index[slots]
+            err = self.joint_err[slots]
+        return {
+            "frames": int(self.count),
+            "t": np.round(t, 3).tolist(),
+            "accuracy": np.round(acc, 2).tolist(),
+            "ref_index": idx.tolist(),
+            "joints": {name: [None if not np.isfinite(v) else round(float(v), 2) for v in err[:, j]]
+                       for j, name in enumerate(self.joint_names)},
+        }
+
+    def joint_summary(self) -> dict:
+        """Mean angle error per joint over the retained history."""
+        with self._lock:
+            n = len(self)
+            if n == 0: return {}
+            err = self.joint_err if n == self.capacity else self.joint_err[:n]
+            m = np.isfinite(err)
+            cnt = m.sum(axis=0)
+            mean = np.where(m, err, 0.0).sum(axis=0) / np.maximum(cnt, 1)
+            mean[cnt == 0] = np.nan
+        return {name: (None if not np.isfinite(v) else round(float(v), 2))
+                for name, v in zip(self.joint_names, mean)}
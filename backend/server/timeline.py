@@ -0,0 +1,98 @@
+# server/timeline.py
+# One clock per station for everything that follows the reference: a single loop
+# ticks at the display rate, computes the reference cursor and interpolated frame
+# once per tick, and hands the same Tick to every consumer (live scoring/ghost, coach
+# panel, ...). Consumers block in wait() instead of running their own sleep loops, so
+# they cannot drift apart or restart the timeline.
+#
+# The loop starts on the first wait() and exits after IDLE_SEC without one; latest()
+# works without it (computes a fresh tick on demand, e.g. for WebSocket stations).
+#
+# A compute() error does not kill the loop: it is logged (once per distinct error)
+# and the loop keeps ticking without publishing, so wait() times out into an
+# on-demand compute and the error reaches the consumer instead of a stale tick.
+import sys
+import threading
+import time
+from typing import Callable, NamedTuple, Tuple
+
+import numpy as np
+
+IDLE_SEC = 2.0
+
+
+def _log(*a): print("[timeline]", *a, file=sys.stderr, flush=True)
+
+
+class Tick(NamedTuple):
+    seq: int
+    wall: float  # time.time() of the tick
+    t_ref: float  # reference time, seconds (before looping)
+    cursor: Tuple[int, int, float]  # (i, j, w), see DanceComparison.ref_cursor
+    ref_frame: np.ndarray  # (33, 2) interpolated reference landmarks, normalized
+
+
+class Timeline:
+    def __init__(self, fps: float, compute: Callable[[float], Tuple[float, tuple, np.ndarray]]):
+        """compute(wall_time) -> (t_ref, cursor, ref_frame)."""
+        self.period = 1.0 / fps
+        self._compute = compute
+        self._cv = threading.Condition()
+        self._tick = None
+        self._seq = 0
+        self._thread = None
+        self._last_demand = 0.0
+        self.late_ticks = 0
+        self.errors = 0
+        self._last_error = None
+
+    def _make(self, now):
+        t_ref, cursor, frame = self._compute(now)
+        self._seq += 1
+        return Tick(self._seq, now, t_ref, cursor, frame)
+
+    def _run(self):
+        next_t = time.perf_counter()
+        while True:
+            with self._cv:
+                if time.time() - self._last_demand > IDLE_SEC:
+                    self._thread = None
+                    return
+                try:
+                    self._tick = self._make(time.time())
+                    self._last_error = None
+                    self._cv.notify_all()
+                except Exception as e:
+                    self.errors += 1
+                    if repr(e) != self._last_error:
+                        self._last_error = repr(e)
+                        _log("tick failed:", self._last_error)
+            next_t += self.period
+            wait = next_t - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            elif wait < -self.period:
+                # fell behind (GC, CPU starved): skip ahead instead of bursting
+                self.late_ticks += 1
+                next_t = time.perf_counter()
+
+    def wait(self, after_seq: int, timeout: float = 1.0) -> Tick:
+        """Newest tick with seq > after_seq; blocks until the next one if none is newer."""
+        with self._cv:
+            self._last_demand = time.time()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="timeline", daemon=True)
+                self._thread.start()
+            if self._cv.wait_for(lambda: self._tick is not None and self._tick.seq > after_seq, timeout):
+                return self._tick
+            # loop late or failing: compute now rather than hand out a stale tick
+            self._tick = self._make(time.time())
+            return self._tick
+
+    def latest(self) -> Tick:
+        """Current tick: the loop's newest if it is running, else computed now."""
+        with self._cv:
+            now = time.time()
+            if self._thread is None or self._tick is None or now - self._tick.wall > 2 * self.period:
+                self._tick = self._make(now)
+            return self._tick
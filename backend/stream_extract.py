@@ -0,0 +1,253 @@
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+from videoProcessor import DEFAULT_PROFILE, open_pose_model, pose_frame_record
+
+# Streaming pose extraction: video bytes go through an ffmpeg pipe and landmark frames
+# come out while the data is still arriving (e.g. a clip that is still downloading).
+#
+#   source bytes -> feeder thread -> ffmpeg stdin | ffmpeg stdout (y4m) -> reader thread
+#       -> bounded frame queue -> pose model -> yielded frame records
+#
+# Backpressure is end to end: when inference falls behind the frame queue fills, the
+# reader stops draining ffmpeg, ffmpeg stops reading its stdin and the feeder blocks.
+#
+# The input has to be decodable front to back: webm/mkv/ts, fragmented mp4 or mp4 with
+# the moov atom first (yt_dlp: --downloader-args "ffmpeg:-movflags +faststart").
+
+FFMPEG = os.environ.get("FFMPEG_BIN", "ffmpeg")
+CHUNK_BYTES = 64 * 1024
+FRAME_QUEUE_SIZE = 8
+GROWING_FILE_IDLE_SEC = 5.0  # a growing file with no new bytes for this long is treated as finished
+GROWING_FILE_POLL_SEC = 0.05
+
+_EOS = object()
+
+
+# ---------- byte sources ----------
+def file_chunks(f, chunk=CHUNK_BYTES):
+    while True:
+        b = f.read(chunk)
+        if not b:
+            return
+        yield b
+
+
+def growing_file_chunks(path, done=None, idle_sec=GROWING_FILE_IDLE_SEC, chunk=CHUNK_BYTES):
+    """
+    Tail a file that is still being written. Stops once done() returns True and
+    everything has been read, or when the file has not grown for idle_sec.
+    """
+    while not os.path.exists(path):
+        if done is not None and done():
+            return
+        time.sleep(GROWING_FILE_POLL_SEC)
+    with open(path, "rb") as f:
+        last_data = time.time()
+        while True:
+            b = f.read(chunk)
+            if b:
+                last_data = time.time()
+                yield b
+                continue
+            if done is not None and done():
+                rest = f.read()
+                if rest:
+                    yield rest
+                return
+            if time.time() - last_data > idle_sec:
+                return
+            time.sleep(GROWING_FILE_POLL_SEC)
+
+
+def throttled_chunks(path, bytes_per_sec, chunk=CHUNK_BYTES):
+    """Read a local file at a fixed byte rate; simulates a slow download."""
+    with open(path, "rb") as f:
+        t0, sent = time.time(), 0
+        for b in file_chunks(f, chunk):
+            sent += len(b)
+            ahead = sent / bytes_per_sec - (time.time() - t0)
+            if ahead > 0:
+                time.sleep(ahead)
+            yield b
+
+
+def _as_chunks(source):
+    if isinstance(source, (str, os.PathLike)):
+        return growing_file_chunks(source)
+    if hasattr(source, "read"):
+        return file_chunks(source)
+    return iter(source)
+
+
+# ---------- y4m decoding ----------
+def _read_exact(f, n):
+    buf = bytearray()
+    while len(buf) < n:
+        b = f.read(n - len(buf))
+        if not b:
+            return None
+        buf += b
+    return bytes(buf)
+
+
+def y4m_frames(f):
+    """Yield BGR frames from a YUV4MPEG2 (yuv420p) byte stream. Returns (w, h, fps) first."""
+    header = f.readline()
+    if not header.startswith(b"YUV4MPEG2"):
+        raise ValueError("not a y4m stream")
+    w = h = 0
+    fps = 30.0
+    for tok in header.split()[1:]:
+        if tok[:1] == b"W": w = int(tok[1:])
+        elif tok[:1] == b"H": h = int(tok[1:])
+        elif tok[:1] == b"F":
+            num, den = tok[1:].split(b":")
+            fps = int(num) / max(1, int(den))
+    yield w, h, fps
+    size = w * h * 3 // 2
+    while True:
+        line = f.readline()
+        if not line.startswith(b"FRAME"):
+            return
+        data = _read_exact(f, size)
+        if data is None:
+            return
+        yuv = np.frombuffer(data, np.uint8).reshape(h * 3 // 2, w)
+        yield cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_I420)
+
+
+# ---------- pipeline ----------
+def stream_reference_frames(source, profile=DEFAULT_PROFILE, min_detection_confidence=0.5,
+                            min_tracking_confidence=0.5, info=None):
+    """
+    Generator of reference frame records (same shape as process_reference_video's
+    "frames") produced while source is still arriving. source may be a path to a
+    (possibly growing) file, a binary file-like object or an iterable of byte chunks.
+    If info is a dict it is filled with fps / total_frames once known.
+    """
+    proc = subprocess.Popen(
+        [FFMPEG, "-loglevel", "error", "-i", "pipe:0", "-an",
+         "-pix_fmt", "yuv420p", "-f", "yuv4mpegpipe", "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+    )
+    frames_q = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    errors = []
+    stop = threading.Event()
+
+    def feed():
+        try:
+            for b in _as_chunks(source):
+                if stop.is_set():
+                    break
+                proc.stdin.write(b)  # blocks when ffmpeg is not draining
+        except (BrokenPipeError, OSError):
+            pass
+        except Exception as e:
+            errors.append(e)
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    def read():
+        try:
+            for item in y4m_frames(proc.stdout):
+                if stop.is_set():
+                    break
+                frames_q.put(item)  # blocks when inference falls behind
+        except Exception as e:
+            errors.append(e)
+        finally:
+            frames_q.put(_EOS)
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    reader = threading.Thread(target=read, daemon=True)
+    feeder.start()
+    reader.start()
+
+    try:
+        first = frames_q.get()
+        if first is _EOS:
+            return
+        _, _, fps = first
+        if info is not None:
+            info["fps"] = fps
+        frame_index = 0
+        with open_pose_model(profile, min_detection_confidence, min_tracking_confidence) as model:
+            while True:
+                frame = frames_q.get()
+                if frame is _EOS:
+                    break
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                rgb.flags.writeable = False
+                results = model.process(rgb)
+                if results.pose_landmarks:
+                    try:
+                        yield pose_frame_record(results.pose_landmarks, frame_index, frame_index / fps)
+                    except Exception as e:
+                        print(f"Error processing frame {frame_index}: {e}")
+                frame_index += 1
+        if info is not None:
+            info["total_frames"] = frame_index
+    finally:
+        stop.set()
+        # stopped early: kill ffmpeg so the reader's pending read returns, then drain
+        if reader.is_alive():
+            proc.kill()
+        while reader.is_alive():
+            try:
+                frames_q.get_nowait()
+            except queue.Empty:
+                reader.join(0.05)
+        proc.stdout.close()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        feeder.join(1.0)
+    if errors:
+        raise errors[0]
+
+
+def process_reference_stream(source, output_json="reference_dance.json", **kwargs):
+    """Streaming counterpart of process_reference_video; writes the same JSON at end of stream."""
+    info = {}
+    t0 = time.time()
+    first_at = None
+    frames_data = []
+    for fr in stream_reference_frames(source, info=info, **kwargs):
+        if first_at is None:
+            first_at = time.time() - t0
+        frames_data.append(fr)
+
+    with open(output_json, "w") as f:
+        json.dump({
+            "title": "Reference Dance",
+            "fps": info.get("fps", 0.0),
+            "total_frames": info.get("total_frames", 0),
+            "frames": frames_data
+        }, f, indent=2)
+
+    print(f"Processed {len(frames_data)} frames in {time.time() - t0:.1f}s "
+          f"(first landmarks after {first_at if first_at is not None else float('nan'):.2f}s)")
+    print(f"Saved to {output_json}")
+    return output_json
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Stream a local video through the extractor at a throttled rate.")
+    ap.add_argument("video")
+    ap.add_argument("--rate", type=float, default=2_000_000, help="bytes per second")
+    ap.add_argument("--out", default="reference_dance.json")
+    args = ap.parse_args()
+    process_reference_stream(throttled_chunks(args.video, args.rate), args.out)
@@ -0,0 +1,131 @@
+import cv2
+import numpy as np
+
+# Local start/end detection for reference clips: a low-resolution frame-difference pass
+# gives a motion-energy curve, and hysteresis thresholds on it pick the span where the
+# dancing happens. No pose model and no network, so it costs a decode of the clip at
+# reduced rate (a few seconds on CPU for a typical 1-3 minute video).
+#
+# energy[i] = mean |gray[i] - gray[i-1]| of SAMPLE_WIDTH-wide frames sampled at
+# SAMPLE_FPS, smoothed over SMOOTH_SEC. Thresholds are relative to the clip's own
+# quiet level (low percentile) and busy level (high percentile), so lighting, camera
+# noise and resolution do not need tuning per video.
+
+SAMPLE_WIDTH = 96
+SAMPLE_FPS = 10.0
+SMOOTH_SEC = 0.5
+HIGH_FRAC = 0.35  # enter "active" above quiet + HIGH_FRAC * (busy - quiet)
+LOW_FRAC = 0.15  # leave it below quiet + LOW_FRAC * (busy - quiet)
+MIN_ACTIVE_SEC = 1.5  # shorter bursts (a cut, someone walking past) are ignored
+MAX_GAP_SEC = 2.0  # pauses shorter than this stay inside the routine
+PAD_SEC = 0.5
+MIN_CONTRAST = 1.0  # busy - quiet in gray levels below which the clip is treated as all active
+
+
+def motion_energy(video_path, sample_fps=SAMPLE_FPS, width=SAMPLE_WIDTH):
+    """Returns (t seconds (n,), energy (n,), fps, duration) for frames sampled at ~sample_fps."""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    step = max(1, int(round(fps / sample_fps)))
+    small, idx = [], []
+    size = None
+    i = 0
+    while True:
+        # grab() skips the colour conversion of frames we do not look at
+        if not cap.grab():
+            break
+        if i % step == 0:
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            if size is None:
+                h, w = frame.shape[:2]
+                size = (width, max(1, int(round(h * width / w))))
+            g = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            small.append(g)
+            idx.append(i)
+        i += 1
+    cap.release()
+    duration = (total or i) / fps
+    if len(small) < 2:
+        return np.zeros(0), np.zeros(0), fps, duration
+
+    stack = np.stack(small).astype(np.int16)
+    energy = np.abs(np.diff(stack, axis=0)).mean(axis=(1, 2)).astype(np.float32)
+    t = np.asarray(idx[1:], np.float64) / fps
+    k = max(1, int(round(SMOOTH_SEC * fps / step)))
+    if k > 1 and len(energy) >= k:
+        energy = np.convolve(energy, np.ones(k, np.float32) / k, mode="same")
+    return t, energy, fps, duration
+
+
+def _hysteresis_segments(x, high, low):
+    """[start, end) index runs that rise above high and last until x drops below low."""
+    above, below = x >= high, x < low
+    segs = []
+    i, n = 0, len(x)
+    while i < n:
+        on = np.flatnonzero(above[i:])
+        if not len(on): break
+        a = i + int(on[0])
+        off = np.flatnonzero(below[a:])
+        b = a + int(off[0]) if len(off) else n
+        segs.append([a, b])
+        i = b
+    return segs
+
+
+def active_range_params():
+    """Every knob find_active_range depends on, for keying memoised results."""
+    return {"sample_width": SAMPLE_WIDTH, "sample_fps": SAMPLE_FPS, "smooth_sec": SMOOTH_SEC,
+            "high_frac": HIGH_FRAC, "low_frac": LOW_FRAC, "min_active_sec": MIN_ACTIVE_SEC,
+            "max_gap_sec": MAX_GAP_SEC, "pad_sec": PAD_SEC, "min_contrast": MIN_CONTRAST}
+
+
+def find_active_range(video_path, high_frac=HIGH_FRAC, low_frac=LOW_FRAC,
+                      min_active_sec=MIN_ACTIVE_SEC, max_gap_sec=MAX_GAP_SEC, pad_sec=PAD_SEC):
+    """
+    (start_sec, end_sec, info) of the dancing in video_path. Falls back to the whole
+    clip when the curve is flat or no burst is long enough.
+    """
+    t, e, fps, duration = motion_energy(video_path)
+    info = {"duration": duration, "samples": len(e)}
+    if len(e) < 3:
+        return 0.0, duration, {**info, "reason": "too short"}
+
+    quiet, busy = np.percentile(e, [10, 90])
+    info.update(quiet=float(quiet), busy=float(busy))
+    if busy - quiet < MIN_CONTRAST:
+        return 0.0, duration, {**info, "reason": "flat"}
+
+    dt = float(np.median(np.diff(t)))
+    segs = _hysteresis_segments(e, quiet + high_frac * (busy - quiet), quiet + low_frac * (busy - quiet))
+    merged = []
+    for a, b in segs:
+        if merged and (t[a] - t[merged[-1][1] - 1]) <= max_gap_sec:
+            merged[-1][1] = b
+        else:
+            merged.append([a, b])
+    merged = [(a, b) for a, b in merged if (b - a) * dt >= min_active_sec]
+    if not merged:
+        return 0.0, duration, {**info, "reason": "no sustained motion"}
+
+    # one routine per clip: from the first sustained burst to the end of the last
+    a, b = merged[0][0], merged[-1][1]
+    start = max(0.0, float(t[a]) - dt - pad_sec)
+    end = min(duration, float(t[b - 1]) + pad_sec)
+    info["segments"] = [[round(float(t[x]), 2), round(float(t[y - 1]), 2)] for x, y in merged]
+    return start, end, info
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description="Find where the dancing starts and ends in a clip.")
+    ap.add_argument("video")
+    args = ap.parse_args()
+    t0 = time.time()
+    s, e, info = find_active_range(args.video)
+    print(f"active {s:.2f}s - {e:.2f}s of {info['duration']:.2f}s ({time.time() - t0:.2f}s)", info)
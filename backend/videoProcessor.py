@@ -1,68 +1,443 @@
+import contextlib
 import cv2
 import mediapipe as mp
 import json
+import time
+import numpy as np
+import sys
+from types import SimpleNamespace
 from calculations import extract_joint_angles
+from extraction_cache import ExtractionCache, missing_ranges
+from trim import active_range_params, find_active_range
 
+# motion-adaptive sampling: infer every ADAPTIVE_BASE_STRIDE frames, densify where
+# landmarks move more than ADAPTIVE_MOTION_THRESH (normalized units) per frame
+ADAPTIVE_BASE_STRIDE = 4
+ADAPTIVE_MOTION_THRESH = 0.004
 
-def process_reference_video(video_path, output_json="reference_dance.json"):
-    mp_holistic = mp.solutions.holistic
-    cap = cv2.VideoCapture(video_path)
+# extraction profiles: which MediaPipe solution runs and at what complexity. Only the
+# 33 body landmarks are used downstream, so the Pose-only profiles skip the face and
+# hand models that Holistic also runs.
+PROFILES = {
+    "pose-lite": {"model": "pose", "model_complexity": 0},
+    "pose-full": {"model": "pose", "model_complexity": 1},
+    "pose-heavy": {"model": "pose", "model_complexity": 2},
+    "holistic": {"model": "holistic", "model_complexity": 1},
+}
+DEFAULT_PROFILE = "holistic"
+
+
+def open_pose_model(profile=DEFAULT_PROFILE, min_detection_confidence=0.5,
+                    min_tracking_confidence=0.5, segmentation=False, static_image_mode=False):
+    """
+    Context manager for the MediaPipe model of an extraction profile. The default
+    tracking model expects frames in increasing order; static_image_mode detects every
+    frame on its own (no tracking, no smoothing) for out-of-order inference.
+    """
+    cfg = PROFILES[profile]
+    cls = mp.solutions.pose.Pose if cfg["model"] == "pose" else mp.solutions.holistic.Holistic
+    return cls(static_image_mode=static_image_mode,
+               model_complexity=cfg["model_complexity"],
+               enable_segmentation=segmentation,
+               min_detection_confidence=min_detection_confidence,
+               min_tracking_confidence=min_tracking_confidence)
+
+
+def pose_frame_record(pose_landmarks, frame_index, timestamp):
+    """One entry of the reference JSON "frames" list."""
+    angles = extract_joint_angles(pose_landmarks.landmark)
+
+    # Store landmark coordinates for skeleton overlay
+    landmarks = []
+    for landmark in pose_landmarks.landmark:
+        landmarks.append({
+            "x": landmark.x,
+            "y": landmark.y,
+            "z": landmark.z,
+            "visibility": landmark.visibility
+        })
+
+    return {
+        "frame_index": frame_index,
+        "timestamp": timestamp,
+        "angles": angles,
+        "landmarks": landmarks  # Added for skeleton overlay
+    }
 
+
+def _extract_range(cap, model, start_frame, end_frame, sample_every=1):
+    """
+    Run the pose model over source frames [start_frame, end_frame). Returns (pose frames,
+    stop) where stop is one past the last frame decoded: less than end_frame when the
+    video ended (or stopped decoding) first.
+    """
     frames_data = []
-    frame_index = 0
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frame_index = start_frame
 
-    with mp_holistic.Holistic(min_detection_confidence=0.5, min_tracking_confidence=0.5) as holistic:
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
+    while cap.isOpened() and frame_index < end_frame:
+        if frame_index % sample_every:
+            # skipped by the sample rate: advance without decoding
+            if not cap.grab():
                 break
+            frame_index += 1
+            continue
 
-            # process frame
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame_rgb.flags.writeable = False
-            results = holistic.process(frame_rgb)
-
-            # extract angles and landmarks if pose detected
-            if results.pose_landmarks:
-                try:
-                    angles = extract_joint_angles(results.pose_landmarks.landmark)
-
-                    # Store landmark coordinates for skeleton overlay
-                    landmarks = []
-                    for landmark in results.pose_landmarks.landmark:
-                        landmarks.append({
-                            "x": landmark.x,
-                            "y": landmark.y,
-                            "z": landmark.z,
-                            "visibility": landmark.visibility
-                        })
-
-                    frames_data.append({
-                        "frame_index": frame_index,
-                        "timestamp": cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0,
-                        "angles": angles,
-                        "landmarks": landmarks  # Added for skeleton overlay
-                    })
-                except Exception as e:
-                    print(f"Error processing frame {frame_index}: {e}")
+        ret, frame = cap.read()
+        if not ret:
+            break
 
-            frame_index += 1
+        # process frame
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        frame_rgb.flags.writeable = False
+        results = model.process(frame_rgb)
+
+        # extract angles and landmarks if pose detected
+        if results.pose_landmarks:
+            try:
+                frames_data.append(pose_frame_record(
+                    results.pose_landmarks, frame_index, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0))
+            except Exception as e:
+                print(f"Error processing frame {frame_index}: {e}")
+
+        frame_index += 1
+
+    return frames_data, frame_index
+
+
+def _landmark_array(record):
+    return np.array([[lm["x"], lm["y"], lm["z"], lm["visibility"]] for lm in record["landmarks"]],
+                    np.float32)
+
+
+def _motion_per_frame(rec_a, rec_b, gap):
+    """Mean displacement of confidently visible landmarks per frame (normalized units)."""
+    a, b = _landmark_array(rec_a), _landmark_array(rec_b)
+    m = (a[:, 3] > 0.5) & (b[:, 3] > 0.5)
+    if not m.any():
+        return float("inf")
+    return float(np.linalg.norm(a[m, :2] - b[m, :2], axis=1).mean()) / gap
+
+
+def _interpolated_record(rec_a, rec_b, w, frame_index, timestamp):
+    arr = (1.0 - w) * _landmark_array(rec_a) + w * _landmark_array(rec_b)
+    pose = SimpleNamespace(landmark=[SimpleNamespace(x=float(x), y=float(y), z=float(z), visibility=float(v))
+                                     for x, y, z, v in arr])
+    record = pose_frame_record(pose, frame_index, timestamp)
+    record["interpolated"] = True
+    return record
+
+
+def _extract_range_adaptive(cap, model, refine_model, start_frame, end_frame,
+                            base_stride=ADAPTIVE_BASE_STRIDE, motion_thresh=ADAPTIVE_MOTION_THRESH):
+    """
+    Like _extract_range, but the model only runs every base_stride frames. Where the pose
+    moved faster than motion_thresh (normalized units per frame) between two inferred
+    frames, the span is bisected and inferred more densely, down to every frame.
+    Frames that were not inferred get landmarks linearly interpolated from their
+    neighbours. Every frame is still decoded (cheap next to inference) and held in a
+    buffer of base_stride + 1 frames, so refinement never seeks.
+
+    The tracking `model` only sees the stride frames, in increasing order. Bisection
+    visits frames out of order, so refinement inferences go to refine_model, which
+    must be a static-image (untracked, unsmoothed) model.
+
+    Returns (pose frames, stop) like _extract_range.
+    """
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    out = []
+    buf = []  # [frame_index, frame, timestamp]
+    records = {}  # frame_index -> record, or None when no pose was found
+
+    def infer(i, m=model):
+        fi, frame, ts = buf[i]
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        frame_rgb.flags.writeable = False
+        results = m.process(frame_rgb)
+        rec = None
+        if results.pose_landmarks:
+            try:
+                rec = pose_frame_record(results.pose_landmarks, fi, ts)
+            except Exception as e:
+                print(f"Error processing frame {fi}: {e}")
+        records[fi] = rec
+
+    def refine(lo, hi):
+        if hi - lo <= 1:
+            return
+        a, b = records[buf[lo][0]], records[buf[hi][0]]
+        if a is not None and b is not None and _motion_per_frame(a, b, hi - lo) <= motion_thresh:
+            return
+        mid = (lo + hi) // 2
+        infer(mid, refine_model)
+        refine(lo, mid)
+        refine(mid, hi)
+
+    def flush(last):
+        # emit buf[1..last] (buf[0] was emitted with the previous span)
+        known = [i for i in range(last + 1) if buf[i][0] in records]
+        for lo, hi in zip(known, known[1:]):
+            a, b = records[buf[lo][0]], records[buf[hi][0]]
+            for i in range(lo + 1, hi):
+                if a is not None and b is not None:
+                    fi, _, ts = buf[i]
+                    out.append(_interpolated_record(a, b, (i - lo) / (hi - lo), fi, ts))
+            if b is not None:
+                out.append(b)
+
+    frame_index = start_frame
+    while cap.isOpened() and frame_index < end_frame:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        buf.append([frame_index, frame, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0])
+        frame_index += 1
+        if len(buf) == 1:
+            infer(0)
+            if records[buf[0][0]] is not None:
+                out.append(records[buf[0][0]])
+            continue
+        if len(buf) - 1 == base_stride:
+            infer(len(buf) - 1)
+            refine(0, len(buf) - 1)
+            flush(len(buf) - 1)
+            buf = buf[-1:]
+            records = {buf[0][0]: records[buf[0][0]]}
+
+    if len(buf) > 1:
+        infer(len(buf) - 1)
+        refine(0, len(buf) - 1)
+        flush(len(buf) - 1)
+    return out, frame_index
 
+
+def extract_reference_frames(video_path, start=None, end=None,
+                             profile=DEFAULT_PROFILE, segmentation=False,
+                             min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                             sample_every=1, adaptive_stride=None,
+                             motion_thresh=ADAPTIVE_MOTION_THRESH, cache=True, auto_trim=False):
+    """
+    Extract pose frames from video_path, optionally trimmed to [start, end) seconds.
+    Returns (frames, fps, total_frames_in_range).
+
+    With auto_trim and no explicit start/end, the range where the dancing happens is
+    found first by a cheap motion-energy pass (trim.find_active_range); with cache=True
+    the detected range is memoised, so reruns skip that pass too.
+
+    With cache=True results are looked up by video content hash plus extraction
+    parameters; frames already processed for an overlapping trim are reused and
+    only the uncovered frame ranges are decoded.
+
+    profile picks the model (see PROFILES); adaptive_stride enables motion-adaptive
+    sampling (see _extract_range_adaptive).
+    """
+    store = ExtractionCache() if cache else None
+    digest = store.video_digest(video_path) if store else None
+
+    if auto_trim and start is None and end is None:
+        trim_params = active_range_params()
+        hit = store.load_trim(digest, trim_params) if store else None
+        if hit:
+            start, end, duration = hit
+        else:
+            start, end, info = find_active_range(video_path)
+            duration = info["duration"]
+            if store:
+                store.store_trim(digest, trim_params, start, end, duration)
+        print(f"Active range of {video_path}: {start:.2f}s - {end:.2f}s of {duration:.2f}s"
+              + (" (cached)" if hit else ""))
+
+    cap = cv2.VideoCapture(video_path)
     fps = cap.get(cv2.CAP_PROP_FPS)
+    start_frame = 0 if start is None else max(0, int(round(start * fps)))
+
+    params = {
+        "profile": PROFILES[profile],
+        "segmentation": segmentation,
+        "min_detection_confidence": min_detection_confidence,
+        "min_tracking_confidence": min_tracking_confidence,
+        "sample_every": sample_every,
+    }
+    if adaptive_stride:
+        params["adaptive"] = {"stride": adaptive_stride, "motion_thresh": motion_thresh, "refine": "static"}
+    # CAP_PROP_FRAME_COUNT is a container estimate and can be 0 (streams, some webm/mkv);
+    # without a usable count the range is open-ended and decoding runs to EOF. Once a
+    # read hits the end, the real count is kept in the cache entry.
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    entry = (store.load(digest, params) if store else None) or {
+        "fps": fps, "total_frames": count if count > 0 else None, "ranges": [], "frames": []
+    }
+    limit = entry.get("total_frames") or sys.maxsize
+    end_frame = limit if end is None else min(limit, int(round(end * fps)))
+
+    gaps = missing_ranges(entry["ranges"], start_frame, end_frame)
+    decoded = 0
+    if gaps:
+        with contextlib.ExitStack() as models:
+            model = models.enter_context(open_pose_model(profile, min_detection_confidence,
+                                                         min_tracking_confidence, segmentation))
+            refine_model = models.enter_context(open_pose_model(
+                profile, min_detection_confidence, min_tracking_confidence, segmentation,
+                static_image_mode=True)) if adaptive_stride else None
+            for a, b in gaps:
+                if adaptive_stride:
+                    frames, stop = _extract_range_adaptive(cap, model, refine_model, a, b,
+                                                           adaptive_stride, motion_thresh)
+                else:
+                    frames, stop = _extract_range(cap, model, a, b, sample_every)
+                entry["frames"].extend(frames)
+                # only what was actually decoded counts as covered
+                if stop > a:
+                    entry["ranges"].append([a, stop])
+                    decoded += stop - a
+                if stop < b:
+                    # the video ends here: later gaps are past EOF
+                    entry["total_frames"] = stop
+                    end_frame = min(end_frame, stop)
+                    break
+        if store:
+            store.store(digest, params, entry)
     cap.release()
 
+    frames_data = [fr for fr in entry["frames"] if start_frame <= fr["frame_index"] < end_frame]
+    frames_data.sort(key=lambda fr: fr["frame_index"])
+
+    total = max(0, end_frame - start_frame) if end_frame < sys.maxsize else 0
+    print(f"Processed {len(frames_data)} frames from {video_path} ({total - decoded} frames from cache)")
+    return frames_data, fps, total
+
+
+def write_reference_json(output_json, frames_data, fps, total_frames, title="Reference Dance"):
     with open(output_json, "w") as f:
         json.dump({
-            "title": "Reference Dance",
+            "title": title,
             "fps": fps,
-            "total_frames": frame_index,
+            "total_frames": total_frames,
             "frames": frames_data
         }, f, indent=2)
 
-    print(f"Processed {len(frames_data)} frames from {video_path}")
+
+def process_reference_video(video_path, output_json="reference_dance.json", auto_trim=True, **kwargs):
+    """
+    Extract pose frames (see extract_reference_frames for options) and write them to
+    output_json. Without start/end only the detected active range is processed.
+    """
+    kwargs["auto_trim"] = auto_trim
+    frames_data, fps, total_frames = extract_reference_frames(video_path, **kwargs)
+    write_reference_json(output_json, frames_data, fps, total_frames)
+
     print(f"Saved to {output_json}")
     return output_json
 
 
+def compare_extractions(baseline, candidate):
+    """
+    Per-frame pose error of candidate frames against baseline frames (matched on
+    frame_index): landmark distance in normalized units and per-joint angle error.
+    """
+    base = {fr["frame_index"]: fr for fr in baseline}
+    lm_err, ang_err = [], {}
+    for fr in candidate:
+        ref = base.get(fr["frame_index"])
+        if ref is None:
+            continue
+        a, b = _landmark_array(ref), _landmark_array(fr)
+        m = a[:, 3] > 0.5
+        if m.any():
+            lm_err.append(float(np.linalg.norm(a[m, :2] - b[m, :2], axis=1).mean()))
+        for k, v in ref["angles"].items():
+            if k in fr["angles"]:
+                ang_err.setdefault(k, []).append(abs(fr["angles"][k] - v))
+
+    lm = np.array(lm_err) if lm_err else np.zeros(1)
+    return {
+        "matched_frames": len(lm_err),
+        "baseline_frames": len(baseline),
+        "candidate_frames": len(candidate),
+        "landmark_err_mean": float(lm.mean()),
+        "landmark_err_p95": float(np.percentile(lm, 95)),
+        "landmark_err_max": float(lm.max()),
+        "angle_err_mean_deg": {k: round(float(np.mean(v)), 2) for k, v in ang_err.items()},
+    }
+
+
+def adaptive_error_report(video_path, adaptive_stride=ADAPTIVE_BASE_STRIDE,
+                          motion_thresh=ADAPTIVE_MOTION_THRESH, start=None, end=None,
+                          profile=DEFAULT_PROFILE):
+    """Run full-rate and adaptive extraction over the same range and compare time and pose error."""
+    t0 = time.perf_counter()
+    full, _, _ = extract_reference_frames(video_path, start=start, end=end, profile=profile, cache=False)
+    t_full = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    adaptive, _, _ = extract_reference_frames(video_path, start=start, end=end, profile=profile, cache=False,
+                                              adaptive_stride=adaptive_stride, motion_thresh=motion_thresh)
+    t_adaptive = time.perf_counter() - t0
+
+    report = compare_extractions(full, adaptive)
+    report.update({
+        "full_sec": round(t_full, 3),
+        "adaptive_sec": round(t_adaptive, 3),
+        "speedup": round(t_full / max(t_adaptive, 1e-9), 2),
+        "interpolated_frames": sum(1 for fr in adaptive if fr.get("interpolated")),
+    })
+    return report
+
+
+def compare_profiles(video_path, profiles=tuple(PROFILES), baseline=DEFAULT_PROFILE,
+                     start=None, end=None, segmentation=False):
+    """
+    Run several extraction profiles over the same video range and report throughput
+    (frames/sec) and per-joint angle deviation from the baseline profile.
+    """
+    runs = {}
+    for name in dict.fromkeys([baseline, *profiles]):
+        t0 = time.perf_counter()
+        frames, _, total = extract_reference_frames(video_path, start=start, end=end, profile=name,
+                                                    segmentation=segmentation, cache=False)
+        sec = time.perf_counter() - t0
+        runs[name] = (frames, total / max(sec, 1e-9), sec)
+
+    report = {}
+    base_frames = runs[baseline][0]
+    for name, (frames, fps, sec) in runs.items():
+        err = compare_extractions(base_frames, frames)
+        angles = err["angle_err_mean_deg"]
+        report[name] = {
+            "seconds": round(sec, 2),
+            "frames_per_sec": round(fps, 1),
+            "pose_frames": len(frames),
+            "angle_err_mean_deg": angles,
+            "angle_err_overall_deg": round(float(np.mean(list(angles.values()))), 2) if angles else None,
+        }
+    return report
+
+
+def print_profile_report(report):
+    joints = sorted({k for r in report.values() for k in r["angle_err_mean_deg"]})
+    print(f"{'profile':<12}{'fps':>8}{'frames':>8}{'err°':>7}  " + " ".join(f"{j[:9]:>9}" for j in joints))
+    for name, r in report.items():
+        overall = "-" if r["angle_err_overall_deg"] is None else f"{r['angle_err_overall_deg']:.2f}"
+        cells = " ".join(f"{r['angle_err_mean_deg'].get(j, float('nan')):>9.2f}" for j in joints)
+        print(f"{name:<12}{r['frames_per_sec']:>8.1f}{r['pose_frames']:>8}{overall:>7}  {cells}")
+
+
 if __name__ == "__main__":
-    process_reference_video("test.mp4")
\ No newline at end of file
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("video", nargs="?", default="test.mp4")
+    ap.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(PROFILES))
+    ap.add_argument("--segmentation", action="store_true")
+    ap.add_argument("--compare", metavar="PROFILES",
+                    help="comma-separated profiles to benchmark against --baseline instead of extracting")
+    ap.add_argument("--baseline", default=DEFAULT_PROFILE, choices=sorted(PROFILES))
+    ap.add_argument("--no-trim", action="store_true", help="process the whole clip, not just the active range")
+    args = ap.parse_args()
+
+    if args.compare:
+        print_profile_report(compare_profiles(args.video, args.compare.split(","), args.baseline,
+                                              segmentation=args.segmentation))
+    else:
+        process_reference_video(args.video, profile=args.profile, segmentation=args.segmentation,
+                                auto_trim=not args.no_trim)
@@ -11,6 +11,7 @@ function App() {
   const [selection, setSelection] = useState(null);
   const [finalScore, setFinalScore] = useState(null);
   const [finalAccuracy, setFinalAccuracy] = useState(null);
+  const [finalStation, setFinalStation] = useState(0);
 
   return (
     <div className="min-h-screen bg-slate-950 text-slate-100">
@@ -30,9 +31,10 @@ function App() {
         <Protected>
           <Play
             selection={selection}
-            onFinish={({ score, accuracy }) => {
+            onFinish={({ score, accuracy, station }) => {
               setFinalScore(score);
               setFinalAccuracy(accuracy);
+              setFinalStation(station);
               setScreen("RESULTS");
             }}
             onQuit={() => setScreen("HOME")}
@@ -45,6 +47,8 @@ function App() {
           <Results
             score={finalScore}
             accuracy={finalAccuracy}
+            station={finalStation}
+            dance={selection?.title}
             onHome={() => setScreen("HOME")}
           />
         </Protected>
@@ -0,0 +1,40 @@
+// src/components/BrowserPoseCamera.jsx
+import { useEffect, useRef, useState } from "react";
+import { usePose } from "../pose/usePose";
+
+// Hybrid mode camera: the webcam plays in a <video> here, usePose runs inference in
+// the browser and every frame's landmarks go to onLandmarks(lms | null, w, h)
+// (e.g. connectRemoteScoring's send). Mounted only in that mode, so the server
+// camera path never loads the in-browser model.
+export default function BrowserPoseCamera({ onLandmarks, className = "" }) {
+  const videoRef = useRef(null);
+  const [error, setError] = useState(null);
+  usePose(videoRef, { onLandmarks });
+
+  useEffect(() => {
+    let stream = null;
+    let cancelled = false;
+    navigator.mediaDevices
+      ?.getUserMedia({ video: { width: 1280, height: 720 }, audio: false })
+      .then((s) => {
+        if (cancelled) { s.getTracks().forEach((t) => t.stop()); return; }
+        stream = s;
+        const v = videoRef.current;
+        if (v) { v.srcObject = s; v.play().catch(() => {}); }
+      })
+      .catch((e) => setError(e?.message || "camera unavailable"));
+    return () => {
+      cancelled = true;
+      stream?.getTracks().forEach((t) => t.stop());
+    };
+  }, []);
+
+  return (
+    <div className="relative w-full">
+      <video ref={videoRef} className={`${className} -scale-x-100`} muted playsInline />
+      {error && (
+        <div className="absolute inset-0 grid place-items-center text-sm text-rose-300">{error}</div>
+      )}
+    </div>
+  );
+}
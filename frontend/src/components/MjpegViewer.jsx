@@ -1,13 +1,23 @@
 // src/components/MjpegViewer.jsx
 import { useEffect, useRef } from "react";
+import { traceMjpeg } from "../services/latencyCollector";
 
-export default function MjpegViewer({ src, className = "", alt = "" }) {
+// with `trace` (a latency collector) the stream is read via fetch so the per-part
+// timing headers are visible (traceMjpeg reconnects on its own); `traceName` labels
+// it in the reports
+export default function MjpegViewer({ src, className = "", alt = "", trace = null, traceName = src }) {
   const imgRef = useRef(null);
 
-  // simple reconnect on error
   useEffect(() => {
     const img = imgRef.current;
-    if (!img) return;
+    if (!img || !trace) return;
+    return traceMjpeg(src, img, trace, traceName);
+  }, [src, trace, traceName]);
+
+  // simple reconnect on error (plain <img> mode)
+  useEffect(() => {
+    const img = imgRef.current;
+    if (!img || trace) return;
     let t;
     const onErr = () => {
       t = setTimeout(() => {
@@ -19,12 +29,12 @@ export default function MjpegViewer({ src, className = "", alt = "" }) {
       img.removeEventListener("error", onErr);
       clearTimeout(t);
     };
-  }, [src]);
+  }, [src, trace]);
 
   return (
     <img
       ref={imgRef}
-      src={src}
+      src={trace ? undefined : src}
       alt={alt}
       className={`block ${className}`}
       draggable={false}
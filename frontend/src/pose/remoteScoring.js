@@ -0,0 +1,101 @@
+// src/pose/remoteScoring.js
+// Hybrid mode: pose inference runs here in the browser (usePose) and only the
+// landmarks go to the server, which aligns them to the reference and scores them.
+// Binary layout mirrors backend/server/remote_pose.py (little endian).
+
+const VERSION = 1;
+const QUANT = 8192;
+const N_LM = 33;
+const IN_HEAD = 20;
+const OUT_HEAD = 20;
+
+export function encodeLandmarks(seq, lms, width, height) {
+  const hasPose = Array.isArray(lms) && lms.length >= N_LM;
+  const buf = new ArrayBuffer(hasPose ? IN_HEAD + N_LM * 5 : IN_HEAD);
+  const dv = new DataView(buf);
+  dv.setUint8(0, VERSION);
+  dv.setUint8(1, hasPose ? 1 : 0);
+  dv.setUint32(4, seq >>> 0, true);
+  dv.setFloat64(8, performance.now(), true);
+  dv.setUint16(16, width, true);
+  dv.setUint16(18, height, true);
+  if (!hasPose) return buf;
+  const q = (v) => Math.max(-32768, Math.min(32767, Math.round((v ?? 0) * QUANT)));
+  for (let i = 0; i < N_LM; i++) {
+    dv.setInt16(IN_HEAD + i * 4, q(lms[i].x), true);
+    dv.setInt16(IN_HEAD + i * 4 + 2, q(lms[i].y), true);
+    const vis = lms[i].visibility ?? 1;
+    dv.setUint8(IN_HEAD + N_LM * 4 + i, Math.max(0, Math.min(255, Math.round(vis * 255))));
+  }
+  return buf;
+}
+
+export function decodeResult(buf) {
+  const dv = new DataView(buf);
+  const out = {
+    seq: dv.getUint32(4, true),
+    frameAccuracy: dv.getFloat32(8, true),
+    accuracy: dv.getFloat32(12, true),
+    score: dv.getFloat32(16, true),
+    ghost: null,
+  };
+  if (dv.getUint8(1) & 1) {
+    out.ghost = [];
+    for (let i = 0; i < N_LM; i++) {
+      const x = dv.getInt16(OUT_HEAD + i * 4, true);
+      const y = dv.getInt16(OUT_HEAD + i * 4 + 2, true);
+      out.ghost.push(x === -32768 ? null : { x: x / QUANT, y: y / QUANT });
+    }
+  }
+  return out;
+}
+
+/**
+ * connectRemoteScoring(url, onResult) =>
+ *   { send(lms, w, h), play(flag, fields), stop(), calibrate(), close() }
+ * Frames are dropped (not queued) while the socket is still flushing earlier ones.
+ * play(true, { player, name, dance }) starts a session; stop() ends it and resolves
+ * with the committed session (or null if the server did not answer in time).
+ */
+export function connectRemoteScoring(url = "ws://localhost:8000/ws/pose", onResult) {
+  const ws = new WebSocket(url);
+  ws.binaryType = "arraybuffer";
+  let seq = 0;
+  let station = null;
+  let stopped = null; // resolve() of a pending stop()
+
+  ws.onmessage = (e) => {
+    if (typeof e.data === "string") {
+      try {
+        const msg = JSON.parse(e.data);
+        if (msg.station != null) station = msg.station;
+        if ("session" in msg) { stopped?.(msg.session); stopped = null; }
+      } catch {}
+      return;
+    }
+    onResult?.(decodeResult(e.data));
+  };
+
+  const ready = () => ws.readyState === WebSocket.OPEN;
+  return {
+    get station() { return station; },
+    send(lms, width, height) {
+      // width/height are 0 until the video has its first frame; the server rejects those
+      if (!ready() || !width || !height || ws.bufferedAmount > 4096) return false;
+      ws.send(encodeLandmarks(seq++, lms, width, height));
+      return true;
+    },
+    play(flag, fields = {}) { if (ready()) ws.send(JSON.stringify({ ...fields, play: !!flag })); },
+    stop(timeoutMs = 3000) {
+      if (!ready()) return Promise.resolve(null);
+      return new Promise((resolve) => {
+        stopped?.(null);
+        stopped = resolve;
+        setTimeout(() => { if (stopped === resolve) { stopped = null; resolve(null); } }, timeoutMs);
+        ws.send(JSON.stringify({ play: false }));
+      });
+    },
+    calibrate() { if (ready()) ws.send(JSON.stringify({ calibrate: true })); },
+    close() { ws.close(); },
+  };
+}
@@ -3,8 +3,12 @@ import { useEffect, useRef, useState } from "react";
 import { FilesetResolver, PoseLandmarker } from "@mediapipe/tasks-vision";
 import { computeJointAngles } from "./poseUtils";
 
-export function usePose(videoEl) {
+// onLandmarks(lms | null, videoWidth, videoHeight) is called for every processed
+// frame, e.g. to stream them to the server with connectRemoteScoring.
+export function usePose(videoEl, { onLandmarks } = {}) {
   const lmkrRef = useRef(null);
+  const onLandmarksRef = useRef(onLandmarks);
+  onLandmarksRef.current = onLandmarks;
   const [landmarks, setLandmarks] = useState(null);
   const [angles, setAngles] = useState(null);
 
@@ -31,6 +35,7 @@ export function usePose(videoEl) {
         if (v && !v.paused && !v.ended) {
           const result = lmkrRef.current.detectForVideo(v, Date.now());
           const lms = result?.landmarks?.[0] || null;
+          onLandmarksRef.current?.(lms, v.videoWidth, v.videoHeight);
           if (lms) {
             setLandmarks(lms);
             setAngles(computeJointAngles(lms));
@@ -1,29 +1,67 @@
 // src/screens/Play.jsx
 import { useEffect, useRef, useState } from "react";
+import { useAuth0 } from "@auth0/auth0-react";
 import MjpegViewer from "../components/MjpegViewer";
+import BrowserPoseCamera from "../components/BrowserPoseCamera";
+import { connectRemoteScoring } from "../pose/remoteScoring";
+import { createLatencyCollector, observeMetricsEvent } from "../services/latencyCollector";
 
 export default function Play({ selection, onFinish, onQuit }) {
+  const { user } = useAuth0();
   const [counting, setCounting] = useState(false);
   const [count, setCount] = useState(3);
   const [running, setRunning] = useState(false);
+  const runningRef = useRef(false);
+  runningRef.current = running;
 
-  // live metrics from SSE
+  // "server": the backend camera + inference (MJPEG + /metrics);
+  // "browser": hybrid mode, inference here and only landmarks go to /ws/pose
+  const [mode, setMode] = useState("server");
+  const modeRef = useRef(mode);
+  modeRef.current = mode;
+  const remoteRef = useRef(null);
+
+  // live metrics (SSE in server mode, WebSocket replies in browser mode)
   const [accuracy, setAccuracy] = useState(0);
   const [score, setScore] = useState(0);
 
-  // client averages + series for Results
-  const [accSum, setAccSum] = useState(0);
-  const [accFrames, setAccFrames] = useState(0);
+  // accuracy series for the Results chart (the session mean comes from the server:
+  // /metrics only sends changes, so averaging its events would be skewed)
   const accSeriesRef = useRef([]);
 
   const esRef = useRef(null);
   const [mounted, setMounted] = useState(false);
 
+  // glass-to-glass latency + drops, reported to the server's /latency
+  const [latency, setLatency] = useState(null);
+  useEffect(() => {
+    const c = createLatencyCollector();
+    setLatency(c);
+    return () => c.stop();
+  }, []);
+
   useEffect(() => {
     const t = setTimeout(() => setMounted(true), 30);
     return () => clearTimeout(t);
   }, []);
 
+  // hybrid mode: one scoring socket (its own server station) while the mode is on
+  useEffect(() => {
+    if (mode !== "browser") return;
+    const remote = connectRemoteScoring(undefined, (r) => {
+      if (!runningRef.current) return;
+      setAccuracy(r.accuracy);
+      setScore(r.score);
+      accSeriesRef.current.push({ t: Date.now(), a: r.accuracy });
+      if (accSeriesRef.current.length > 7200) accSeriesRef.current.shift();
+    });
+    remoteRef.current = remote;
+    return () => {
+      remote.close();
+      remoteRef.current = null;
+    };
+  }, [mode]);
+
   // 3-sec countdown → start server play + metrics
   useEffect(() => {
     if (!counting) return;
@@ -36,8 +74,18 @@ export default function Play({ selection, onFinish, onQuit }) {
           setCounting(false);
 
           // kick off the backend playback AFTER the countdown
-          fetch("http://localhost:8000/control?play=1").catch(() => {});
+          // (the score store keys players by the opaque auth id, never the email)
+          const who = {
+            player: user?.sub || "guest",
+            name: user?.nickname || user?.name || "",
+            dance: selection?.title || "",
+          };
           setRunning(true);
+          if (mode === "browser") {
+            remoteRef.current?.play(true, who);
+            return 0;
+          }
+          fetch(`http://localhost:8000/control?${new URLSearchParams({ play: "1", ...who })}`).catch(() => {});
 
           // start metrics stream (SSE)
           if (!esRef.current) {
@@ -45,12 +93,11 @@ export default function Play({ selection, onFinish, onQuit }) {
             es.onmessage = (e) => {
               try {
                 const d = JSON.parse(e.data || "{}");
+                observeMetricsEvent(latency, d);
                 const a = Number.isFinite(d.accuracy) ? d.accuracy : 0;
                 const s = Number.isFinite(d.score) ? d.score : 0;
                 setAccuracy(a);
                 setScore(s);
-                setAccSum((p) => p + a);
-                setAccFrames((p) => p + 1);
                 accSeriesRef.current.push({ t: Date.now(), a });
                 if (accSeriesRef.current.length > 7200) accSeriesRef.current.shift(); // ~2min @60fps
               } catch {}
@@ -73,30 +120,40 @@ export default function Play({ selection, onFinish, onQuit }) {
   // cleanup on unmount
   useEffect(() => {
     return () => {
-      try { fetch("http://localhost:8000/control?play=0"); } catch {}
+      // (a browser-mode session ends with its socket)
+      if (modeRef.current === "server") fetch("http://localhost:8000/control?play=0").catch(() => {});
       if (esRef.current) { esRef.current.close(); esRef.current = null; }
     };
   }, []);
 
   const handleStart = () => {
-    // reset both client & server
-    fetch("http://localhost:8000/control?play=0").finally(() => {
+    // reset both client & server (a browser-mode session restarts on play(true))
+    const reset = mode === "browser" ? Promise.resolve() : fetch("http://localhost:8000/control?play=0");
+    reset.catch(() => {}).finally(() => {
       setAccuracy(0); setScore(0);
-      setAccSum(0); setAccFrames(0);
       accSeriesRef.current = [];
       setCounting(true);
     });
   };
 
-  const handleQuit = () => {
-    fetch("http://localhost:8000/control?play=0").catch(() => {});
+  // stops the server session; Results only opens once play=0 has answered, i.e.
+  // after the session is committed, so its leaderboard/history queries include it
+  const handleQuit = async ({ showResults = true } = {}) => {
     if (esRef.current) { esRef.current.close(); esRef.current = null; }
-    const avgAccuracy = accFrames > 0 ? accSum / accFrames : 0;
     setRunning(false);
+    const stopped = mode === "browser"
+      ? remoteRef.current?.stop() ?? Promise.resolve(null)
+      : fetch("http://localhost:8000/control?play=0")
+          .then((r) => (r.ok ? r.json() : null))
+          .then((d) => d?.session ?? null)
+          .catch(() => null);
+    if (!showResults) return;
+    const session = await stopped;
     onFinish?.({
-      score: Math.round(score),
-      accuracy: Math.round(avgAccuracy),
+      score: Math.round(session?.score ?? score),
+      accuracy: Math.round(session?.accuracy ?? 0),
       accuracySeries: accSeriesRef.current.slice(),
+      station: mode === "browser" ? remoteRef.current?.station ?? null : 0,
     });
   };
 
@@ -130,14 +187,22 @@ export default function Play({ selection, onFinish, onQuit }) {
 
           {/* live stat pills */}
           <div className="flex items-center gap-3">
+            <button
+              onClick={() => setMode((m) => (m === "server" ? "browser" : "server"))}
+              disabled={running || counting}
+              title="Where pose inference runs: on the server's camera, or here in the browser"
+              className="px-3 py-1 rounded-md border border-white/15 bg-white/10 text-sm hover:bg-white/20 transition disabled:opacity-40"
+            >
+              Tracking: <span className="font-semibold">{mode === "server" ? "Server" : "Browser"}</span>
+            </button>
             <div className="px-3 py-1 rounded-md border border-white/15 bg-white/10 text-sm transition-all duration-200">
               Acc: <span className="font-semibold">{accuracy.toFixed(1)}%</span>
             </div>
             <div className="px-3 py-1 rounded-md border border-white/15 bg-white/10 text-sm">
-              Score: <span className="font-semibold">{score.toFixed(1)}</span>
+              Score: <span className="font-semibold">{Math.round(score)}</span>
             </div>
             <button
-              onClick={() => { handleQuit(); onQuit?.(); }}
+              onClick={() => { handleQuit({ showResults: false }); onQuit?.(); }}
               className="px-3 py-1.5 rounded-md border border-white/20 hover:bg-white/10 transition"
             >
               ← Home
@@ -156,6 +221,8 @@ export default function Play({ selection, onFinish, onQuit }) {
           <div className="px-4 py-3 text-xs tracking-wider uppercase text-white/70">Coach</div>
           <MjpegViewer
             src="http://localhost:8000/video_ref"
+            trace={latency}
+            traceName="video_ref"
             className="w-full h-[460px] object-cover bg-black"
             alt="reference"
           />
@@ -169,11 +236,20 @@ export default function Play({ selection, onFinish, onQuit }) {
           className={`relative rounded-2xl border border-white/10 bg-white/5 overflow-hidden shadow-[0_0_60px_rgba(34,211,238,0.18)] flex items-center justify-center transform transition duration-500
           ${mounted ? "opacity-100 translate-x-0" : "opacity-0 translate-x-4"}`}
         >
-          <MjpegViewer
-            src="http://localhost:8000/video_live"
-            className="h-[460px] w-full max-w-[1200px] object-contain bg-black"
-            alt="live"
-          />
+          {mode === "browser" ? (
+            <BrowserPoseCamera
+              onLandmarks={(lms, w, h) => remoteRef.current?.send(lms, w, h)}
+              className="h-[460px] w-full max-w-[1200px] object-contain bg-black"
+            />
+          ) : (
+            <MjpegViewer
+              src="http://localhost:8000/video_live"
+              trace={latency}
+              traceName="video_live"
+              className="h-[460px] w-full max-w-[1200px] object-contain bg-black"
+              alt="live"
+            />
+          )}
 
           {/* countdown overlay */}
           {counting && (
@@ -196,7 +272,7 @@ export default function Play({ selection, onFinish, onQuit }) {
             ) : (
               <button
                 className="px-5 py-2 rounded-xl border border-rose-300/30 bg-rose-400/10 hover:bg-rose-400/20 shadow transition"
-                onClick={handleQuit}
+                onClick={() => handleQuit()}
               >
                 Quit
               </button>
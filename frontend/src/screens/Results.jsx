@@ -1,11 +1,46 @@
 // src/screens/Results.jsx
-export default function Results({ score, onHome }) {
+import { useEffect, useState } from "react";
+import { useAuth0 } from "@auth0/auth0-react";
+
+export default function Results({ score, accuracy, station = 0, dance, onHome }) {
+  const { user } = useAuth0();
+  const player = user?.sub || "guest";
+
+  // persisted sessions from the server's score store
+  const [leaders, setLeaders] = useState([]);
+  const [history, setHistory] = useState([]);
+  useEffect(() => {
+    if (!dance) return;
+    const q = (path, params) =>
+      fetch(`http://localhost:8000/scores/${path}?${new URLSearchParams(params)}`)
+        .then((r) => (r.ok ? r.json() : { rows: [] }))
+        .then((d) => d.rows || [])
+        .catch(() => []);
+    q("leaderboard", { dance, limit: 5, per_player: 1 }).then(setLeaders);
+    q("history", { player, dance, limit: 5 }).then(setHistory);
+  }, [dance, player]);
+
+  // per-joint breakdown and per-frame mean accuracy from the server's session telemetry
+  const [jointErr, setJointErr] = useState(null);
+  const [serverAcc, setServerAcc] = useState(null);
+  // (a browser-mode station is gone once its socket closed: station is null then)
+  useEffect(() => {
+    if (station == null) return;
+    fetch(`http://localhost:8000/telemetry?points=300&station=${station}`)
+      .then((r) => (r.ok ? r.json() : null))
+      .then((d) => {
+        setJointErr(d?.joint_mean_error || null);
+        if (d?.session?.frames > 0) setServerAcc(d.session.accuracy);
+      })
+      .catch(() => {});
+  }, [station]);
+
   // Accept either a number or the richer object from Play
   const s = typeof score === "object" && score !== null
     ? score
-    : { score: score ?? 0, accuracy: 0, accuracySeries: [] };
+    : { score: score ?? 0, accuracy: accuracy ?? 0, accuracySeries: [] };
 
-  const avgAcc = Math.max(0, Math.min(100, Math.round(s.accuracy || 0)));
+  const avgAcc = Math.max(0, Math.min(100, Math.round(serverAcc ?? s.accuracy ?? 0)));
   const totalScore = Math.round(s.score || 0);
 
   // mini chart (green up, red down)
@@ -71,6 +106,43 @@ export default function Results({ score, onHome }) {
             </svg>
           </div>
 
+          {jointErr && Object.keys(jointErr).length > 0 && (
+            <div className="mt-6 rounded-xl border border-white/10 bg-slate-900/40 p-4">
+              <div className="text-xs uppercase tracking-wider text-white/60 mb-2">Avg Angle Error by Joint</div>
+              <div className="grid grid-cols-3 gap-2 text-sm">
+                {Object.entries(jointErr).map(([k, v]) => (
+                  <div key={k} className="flex justify-between">
+                    <span className="text-white/70">{k}</span>
+                    <span className="text-white">{v == null ? "–" : `${Math.round(v)}°`}</span>
+                  </div>
+                ))}
+              </div>
+            </div>
+          )}
+
+          {(leaders.length > 0 || history.length > 0) && (
+            <div className="mt-6 grid grid-cols-2 gap-4">
+              <div className="rounded-xl border border-white/10 bg-slate-900/40 p-4">
+                <div className="text-xs uppercase tracking-wider text-white/60 mb-2">Leaderboard</div>
+                {leaders.map((r, i) => (
+                  <div key={r.player} className={`flex justify-between text-sm ${r.player === player ? "text-emerald-300" : ""}`}>
+                    <span className="truncate">{i + 1}. {r.name || "Player"}</span>
+                    <span>{Math.round(r.score)}</span>
+                  </div>
+                ))}
+              </div>
+              <div className="rounded-xl border border-white/10 bg-slate-900/40 p-4">
+                <div className="text-xs uppercase tracking-wider text-white/60 mb-2">Your Recent Runs</div>
+                {history.map((r) => (
+                  <div key={r.id} className="flex justify-between text-sm">
+                    <span className="text-white/70">{new Date(r.started * 1000).toLocaleDateString()}</span>
+                    <span>{Math.round(r.score)} • {Math.round(r.accuracy)}%</span>
+                  </div>
+                ))}
+              </div>
+            </div>
+          )}
+
           <div className="mt-8 flex justify-center">
             <button className="px-4 py-2 rounded-lg border border-white/20 hover:bg-white/10 transition" onClick={onHome}>
               Back to Home
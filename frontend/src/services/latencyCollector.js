@@ -0,0 +1,215 @@
+// src/services/latencyCollector.js
+// Glass-to-glass latency for the MJPEG streams and the metrics SSE.
+// The server stamps every multipart part with X-Frame-Seq / X-Capture-Ts /
+// X-Infer-Ts / X-Encode-Ts (backend/server/latency.py). traceMjpeg() reads the
+// stream itself instead of letting <img src> do it, shows each part in the <img>,
+// and records capture -> painted latency once the frame is on screen. Every
+// `intervalMs` the collector posts percentiles and drop counts to /latency.
+
+const pct = (sorted, p) =>
+  sorted.length ? sorted[Math.min(sorted.length - 1, Math.floor(p * (sorted.length - 1)))] : null;
+const round = (v) => (v == null ? null : Math.round(v * 10) / 10);
+
+// server wall clock minus ours, from the lowest-RTT of a few pings
+export async function estimateClockOffset(base, pings = 5) {
+  let best = null;
+  for (let i = 0; i < pings; i++) {
+    const t0 = Date.now();
+    const r = await fetch(`${base}/latency/clock`, { cache: "no-store" });
+    const { t } = await r.json();
+    const t1 = Date.now();
+    if (!best || t1 - t0 < best.rtt) best = { rtt: t1 - t0, offset: t - (t0 + t1) / 2 };
+  }
+  return best?.offset ?? 0;
+}
+
+export function createLatencyCollector({
+  base = "http://localhost:8000",
+  intervalMs = 5000,
+  client = Math.random().toString(36).slice(2, 10),
+} = {}) {
+  let offset = 0; // add to Date.now() to get server time
+  const streams = {};
+  const windowStart = { t: Date.now() };
+
+  estimateClockOffset(base).then((o) => (offset = o)).catch(() => {});
+
+  const stream = (name) =>
+    (streams[name] ??= { lat: [], server: [], frames: 0, rendered: 0, gaps: 0, skipped: 0, lastSeq: null });
+
+  const serverNow = () => Date.now() + offset;
+
+  const collector = {
+    // a part/event arrived; a jump in seq counts the missing ones as gaps
+    received(name, seq) {
+      const s = stream(name);
+      s.frames++;
+      if (s.lastSeq != null && seq > s.lastSeq + 1) s.gaps += seq - s.lastSeq - 1;
+      s.lastSeq = seq;
+    },
+    // the frame was painted (or the event handled): captureMs/encodeMs are server stamps
+    rendered(name, captureMs, encodeMs) {
+      const s = stream(name);
+      s.rendered++;
+      s.lat.push(serverNow() - captureMs);
+      if (encodeMs != null) s.server.push(encodeMs - captureMs);
+    },
+    // received but replaced by a newer part before it could be shown
+    skipped(name) {
+      stream(name).skipped++;
+    },
+    reset(name) {
+      stream(name).lastSeq = null;
+    },
+    flush() {
+      const now = Date.now();
+      const out = {};
+      for (const [name, s] of Object.entries(streams)) {
+        if (!s.frames) continue;
+        const lat = s.lat.slice().sort((a, b) => a - b);
+        const srv = s.server.slice().sort((a, b) => a - b);
+        out[name] = {
+          frames: s.frames, rendered: s.rendered, gaps: s.gaps, skipped: s.skipped,
+          p50_ms: round(pct(lat, 0.5)), p90_ms: round(pct(lat, 0.9)), p99_ms: round(pct(lat, 0.99)),
+          max_ms: round(lat[lat.length - 1]), server_ms: round(pct(srv, 0.5)),
+          window_sec: round((now - windowStart.t) / 1000),
+        };
+        Object.assign(s, { lat: [], server: [], frames: 0, rendered: 0, gaps: 0, skipped: 0 });
+      }
+      windowStart.t = now;
+      if (!Object.keys(out).length) return null;
+      fetch(`${base}/latency`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ client, streams: out }),
+      }).catch(() => {});
+      return out;
+    },
+    stop() {
+      clearInterval(timer);
+      collector.flush();
+    },
+  };
+  const timer = setInterval(collector.flush, intervalMs);
+  return collector;
+}
+
+// SSE /metrics events carry {seq, ts}
+export function observeMetricsEvent(collector, data, name = "metrics") {
+  if (!collector || !Number.isFinite(data?.seq)) return;
+  collector.received(name, data.seq);
+  collector.rendered(name, data.ts);
+}
+
+const HEADER_END = [13, 10, 13, 10];
+const RETRY_MIN_MS = 600;
+const RETRY_MAX_MS = 5000;
+
+function indexOf(buf, pat, from) {
+  outer: for (let i = from; i <= buf.length - pat.length; i++) {
+    for (let j = 0; j < pat.length; j++) if (buf[i + j] !== pat[j]) continue outer;
+    return i;
+  }
+  return -1;
+}
+
+function parseHeaders(bytes) {
+  const h = {};
+  for (const line of new TextDecoder().decode(bytes).split("\r\n")) {
+    const k = line.indexOf(":");
+    if (k > 0) h[line.slice(0, k).trim().toLowerCase()] = line.slice(k + 1).trim();
+  }
+  return h;
+}
+
+/**
+ * Read a multipart MJPEG stream with fetch and show it in `img`. Returns a stop().
+ * Parts are sized by their Content-Length header; only the newest part is decoded,
+ * so a slow paint shows up as `skipped` rather than growing latency. A dropped or
+ * failed connection is retried with backoff (RETRY_MIN_MS doubling to RETRY_MAX_MS).
+ */
+export function traceMjpeg(url, img, collector, name) {
+  const ctrl = new AbortController();
+  let pending = null; // newest part waiting for the <img>
+  let busy = false;
+  let shownUrl = null;
+
+  const show = () => {
+    if (busy || !pending) return;
+    const part = pending;
+    pending = null;
+    busy = true;
+    const objUrl = URL.createObjectURL(new Blob([part.jpeg], { type: "image/jpeg" }));
+    img.onload = () => {
+      // next animation frame ~ when the decoded image is composited
+      requestAnimationFrame(() => {
+        collector?.rendered(name, part.capture, part.encode);
+        if (shownUrl) URL.revokeObjectURL(shownUrl);
+        shownUrl = objUrl;
+        busy = false;
+        show();
+      });
+    };
+    img.onerror = () => {
+      URL.revokeObjectURL(objUrl);
+      busy = false;
+      show();
+    };
+    img.src = objUrl;
+  };
+
+  // one connection; resolves when the server closes the stream, throws on errors
+  const readOnce = async () => {
+    const resp = await fetch(url, { signal: ctrl.signal, cache: "no-store" });
+    if (!resp.ok || !resp.body) throw new Error(`HTTP ${resp.status}`);
+    const reader = resp.body.getReader();
+    let buf = new Uint8Array(0);
+    collector?.reset(name);
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      const merged = new Uint8Array(buf.length + value.length);
+      merged.set(buf);
+      merged.set(value, buf.length);
+      buf = merged;
+      for (;;) {
+        const he = indexOf(buf, HEADER_END, 0);
+        if (he < 0) break;
+        const h = parseHeaders(buf.subarray(0, he));
+        const len = parseInt(h["content-length"], 10);
+        if (!Number.isFinite(len)) throw new Error("multipart part without Content-Length");
+        const start = he + 4;
+        if (buf.length < start + len) break;
+        const seq = parseInt(h["x-frame-seq"], 10);
+        if (Number.isFinite(seq)) collector?.received(name, seq);
+        if (pending) collector?.skipped(name);
+        pending = {
+          jpeg: buf.slice(start, start + len),
+          capture: parseFloat(h["x-capture-ts"]),
+          encode: parseFloat(h["x-encode-ts"]),
+        };
+        buf = buf.slice(start + len);
+        delay = RETRY_MIN_MS; // got a frame: the next drop reconnects quickly again
+        show();
+      }
+    }
+  };
+
+  // reconnect with backoff (server restart, camera reopen, network blip) until stopped
+  let delay = RETRY_MIN_MS;
+  (async () => {
+    while (!ctrl.signal.aborted) {
+      try {
+        await readOnce();
+      } catch {}
+      if (ctrl.signal.aborted) break;
+      await new Promise((r) => setTimeout(r, delay));
+      delay = Math.min(RETRY_MAX_MS, delay * 2);
+    }
+  })();
+
+  return () => {
+    ctrl.abort();
+    if (shownUrl) URL.revokeObjectURL(shownUrl);
+  };
+}